@@ -0,0 +1,176 @@
+import gc
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import statistics
+import subprocess
+
+from benchmarks.synthetic import FakeEc2Client, generate_inventory, generate_analysis, private_ip
+from routefinder.app import RouteFinder
+from routefinder.dto import RouteFindingResult
+from routefinder.interfaces.config import CommandConfig
+
+DEFAULT_SCALES = (1000, 10000, 100000)
+DEFAULT_RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+DEFAULT_TOLERANCE = 0.2
+LOOKUPS = 10000
+SERIALIZATIONS = 2000
+
+
+def measure(fn, repeat, setup=None):
+    timings = []
+    for _ in range(repeat):
+        state = setup() if setup else None
+        gc.collect()
+        gc.disable()
+        try:
+            started = time.perf_counter()
+            fn(state)
+            timings.append(time.perf_counter() - started)
+        finally:
+            gc.enable()
+    return timings
+
+
+def record(name, scale, timings, ops=1):
+    return {
+        "name": name,
+        "scale": scale,
+        "ops": ops,
+        "repeat": len(timings),
+        "min": min(timings),
+        "median": statistics.median(timings),
+        "per_op_us": min(timings) / ops * 1e6,
+    }
+
+
+def bench_scale(scale, repeat=None):
+    repeat = repeat or max(1, min(5, 100000 // scale))
+    rng = random.Random(scale)
+    pages = generate_inventory(scale)
+    results = []
+
+    timings = measure(lambda _: RouteFinder(ec2_client=FakeEc2Client(pages)), repeat)
+    results.append(record("construction", scale, timings))
+
+    timings = measure(lambda route_finder: route_finder.register_eni(), repeat,
+                      setup=lambda: RouteFinder(ec2_client=FakeEc2Client(pages), preload=False))
+    results.append(record("register_eni", scale, timings))
+
+    route_finder = RouteFinder(ec2_client=FakeEc2Client(pages))
+    ips = [private_ip(rng.randrange(scale)) for _ in range(LOOKUPS)]
+
+    def _get_eni_by_ip(_):
+        for ip in ips:
+            route_finder.get_eni_by_ip(ip)
+
+    def _resolve_ip(_):
+        for ip in ips:
+            route_finder.resolve_ip(ip)
+
+    results.append(record("get_eni_by_ip", scale, measure(_get_eni_by_ip, repeat), ops=len(ips)))
+    results.append(record("resolve_ip", scale, measure(_resolve_ip, repeat), ops=len(ips)))
+
+    instance_ids = list(route_finder.instance_map)
+    configs = []
+    for n in range(SERIALIZATIONS):
+        if n % 2:
+            configs.append(CommandConfig(source_type="IP", source=ips[n % len(ips)],
+                                         destination_type="IP", destination="8.8.8.8", destination_port=443))
+        else:
+            configs.append(CommandConfig(source_type="EC2", source=rng.choice(instance_ids),
+                                         destination_type="EC2", destination=rng.choice(instance_ids)))
+
+    def _serialize(_):
+        for config in configs:
+            config.serialize(route_finder=route_finder)
+
+    results.append(record("serialize", scale, measure(_serialize, repeat), ops=len(configs)))
+
+    components = max(10, scale // 100)
+    result = RouteFindingResult(network_insight_path_id="nip-0", network_insight_analysis_id="nia-0",
+                                detail=generate_analysis(components), region_name="us-east-1")
+    results.append(record("get_result", scale, measure(lambda _: result.get_result(detail=True), repeat)))
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def run(scales, repeat=None) -> dict:
+    results = []
+    for scale in scales:
+        print(f"Benchmarking {scale} endpoints...", file=sys.stderr)
+        results.extend(bench_scale(scale, repeat=repeat))
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "results": results,
+    }
+
+
+def compare(baseline: dict, current: dict, tolerance=DEFAULT_TOLERANCE) -> list:
+    previous = {(r["name"], r["scale"]): r for r in baseline["results"]}
+    regressions = []
+    for r in current["results"]:
+        before = previous.get((r["name"], r["scale"]))
+        if before is None:
+            continue
+        ratio = r["per_op_us"] / before["per_op_us"]
+        flag = "REGRESSION" if ratio > 1 + tolerance else ""
+        print(f"{r['name']:<15} {r['scale']:>8} {before['per_op_us']:>14.2f}us {r['per_op_us']:>14.2f}us "
+              f"{ratio:>6.2f}x {flag}")
+        if flag:
+            regressions.append(r)
+    return regressions
+
+
+def print_results(report: dict):
+    for r in report["results"]:
+        print(f"{r['name']:<15} {r['scale']:>8} min {r['min'] * 1e3:>10.2f}ms  median {r['median'] * 1e3:>10.2f}ms"
+              f"  {r['per_op_us']:>12.2f}us/op")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.bench",
+                                     description="Offline RouteFinder benchmarks on synthetic inventories")
+    parser.add_argument("-s", "--scales", default=",".join(map(str, DEFAULT_SCALES)),
+                        help="comma separated inventory sizes (1000000 needs several GB of memory)")
+    parser.add_argument("-n", "--repeat", type=int,
+                        help="runs per benchmark (default: 5 for small inventories, fewer for large ones)")
+    parser.add_argument("-o", "--output",
+                        help="result file (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--compare", help="baseline result file to compare against")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="slowdown ratio above which --compare reports a regression")
+    args = parser.parse_args()
+
+    report = run([int(scale) for scale in args.scales.split(",")], repeat=args.repeat)
+    print_results(report)
+
+    output = args.output
+    if output is None:
+        os.makedirs(DEFAULT_RESULTS_DIR, exist_ok=True)
+        output = os.path.join(DEFAULT_RESULTS_DIR, report["meta"]["timestamp"].replace(":", "") + ".json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved {output}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if compare(baseline, report, tolerance=args.tolerance):
+            sys.exit(1)
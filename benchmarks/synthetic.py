@@ -0,0 +1,100 @@
+import types
+
+PAGE_SIZE = 1000
+SUBNET_SIZE = 250
+SUBNETS_PER_VPC = 256
+OWNER_ID = "123456789012"
+
+
+def private_ip(i):
+    subnet = i // SUBNET_SIZE
+    return f"10.{subnet >> 8}.{subnet & 255}.{i % SUBNET_SIZE + 4}"
+
+
+def subnet_cidr(subnet):
+    return f"10.{subnet >> 8}.{subnet & 255}.0/24"
+
+
+def _pages(rows, key, wrap=None):
+    pages = []
+    for start in range(0, len(rows), PAGE_SIZE):
+        chunk = rows[start:start + PAGE_SIZE]
+        pages.append({key: wrap(chunk) if wrap else chunk})
+    return pages
+
+
+def generate_inventory(scale) -> dict:
+    # One instance and one ENI per host, 250 hosts per /24 subnet and 256 subnets per /16 VPC.
+    # Nested values that don't vary are shared between rows to keep 1M-scale inventories in memory.
+    subnet_count = max(1, -(-scale // SUBNET_SIZE))
+    vpc_count = max(1, -(-subnet_count // SUBNETS_PER_VPC))
+    groups = [{"GroupId": "sg-00000000000000001", "GroupName": "default"}]
+
+    enis, instances = [], []
+    for i in range(scale):
+        subnet = i // SUBNET_SIZE
+        subnet_id, vpc_id = f"subnet-{subnet:017x}", f"vpc-{subnet // SUBNETS_PER_VPC:017x}"
+        ip = private_ip(i)
+        enis.append({
+            "NetworkInterfaceId": f"eni-{i:017x}", "InterfaceType": "interface", "OwnerId": OWNER_ID,
+            "PrivateIpAddress": ip, "PrivateIpAddresses": [{"PrivateIpAddress": ip, "Primary": True}],
+            "Status": "in-use", "SubnetId": subnet_id, "VpcId": vpc_id, "AvailabilityZone": "us-east-1a",
+            "SourceDestCheck": True, "Description": "", "Groups": groups, "TagSet": [],
+            "Attachment": {"InstanceId": f"i-{i:017x}", "Status": "attached"},
+        })
+        instances.append({
+            "ImageId": "ami-00000000000000001", "InstanceId": f"i-{i:017x}", "InstanceType": "t3.micro",
+            "PrivateIpAddress": ip, "SubnetId": subnet_id, "VpcId": vpc_id,
+            "Tags": [{"Key": "Name", "Value": f"host-{i}"}],
+        })
+    subnets = [{"SubnetId": f"subnet-{s:017x}", "VpcId": f"vpc-{s // SUBNETS_PER_VPC:017x}",
+                "CidrBlock": subnet_cidr(s), "AvailabilityZone": "us-east-1a", "OwnerId": OWNER_ID}
+               for s in range(subnet_count)]
+    vpcs = [{"VpcId": f"vpc-{v:017x}", "CidrBlock": f"10.{v}.0.0/16", "OwnerId": OWNER_ID}
+            for v in range(vpc_count)]
+    igws = [{"InternetGatewayId": f"igw-{v:017x}", "OwnerId": OWNER_ID, "Tags": [],
+             "Attachments": [{"State": "available", "VpcId": f"vpc-{v:017x}"}]} for v in range(vpc_count)]
+
+    return {
+        "describe_network_interfaces": _pages(enis, "NetworkInterfaces"),
+        "describe_instances": _pages(instances, "Reservations", wrap=lambda chunk: [{"Instances": chunk}]),
+        "describe_subnets": _pages(subnets, "Subnets"),
+        "describe_vpcs": _pages(vpcs, "Vpcs"),
+        "describe_internet_gateways": _pages(igws, "InternetGateways"),
+    }
+
+
+def generate_analysis(components) -> dict:
+    return {"NetworkInsightsAnalyses": [{
+        "Status": "succeeded",
+        "NetworkPathFound": True,
+        "Explanations": [],
+        "ForwardPathComponents": [{
+            "SequenceNumber": n + 1,
+            "Component": {"Id": f"eni-{n:017x}", "Name": f"hop-{n}",
+                          "Arn": f"arn:aws:ec2:us-east-1:{OWNER_ID}:network-interface/eni-{n:017x}"},
+            "OutboundHeader": {"DestinationAddresses": ["8.8.8.8/32"], "Protocol": "6",
+                               "DestinationPortRanges": [{"From": 443, "To": 443}],
+                               "SourceAddresses": ["10.0.0.4/32"]},
+            "SecurityGroupRule": {"Cidr": "0.0.0.0/0", "Direction": "egress", "Protocol": "all"},
+        } for n in range(components)],
+    }]}
+
+
+class FakePaginator:
+    def __init__(self, pages):
+        self._pages = pages
+
+    def paginate(self, **kwargs):
+        return iter(self._pages)
+
+
+class FakeEc2Client:
+    # Serves pre-generated Describe pages: a Stubber-backed client would spend
+    # more time validating parameters than RouteFinder spends on the responses.
+    def __init__(self, pages: dict, region_name="us-east-1"):
+        self.pages = pages
+        self.meta = types.SimpleNamespace(region_name=region_name)
+
+    def get_paginator(self, operation_name):
+        return FakePaginator(self.pages.get(operation_name, []))
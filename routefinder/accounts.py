@@ -0,0 +1,72 @@
+import threading
+
+from routefinder.clients import ClientFactory
+
+DEFAULT_ROLE_NAME = "OrganizationAccountAccessRole"
+DEFAULT_ROLE_SESSION_NAME = "routefinder"
+DEFAULT_ROLE_DURATION = 3600
+
+
+def list_organization_accounts(clients: ClientFactory) -> list:
+    paginator = clients.client("organizations").get_paginator("list_accounts")
+    return [account["Id"] for page in paginator.paginate()
+            for account in page["Accounts"] if account["Status"] == "ACTIVE"]
+
+
+class AssumedRoleSessions:
+    # One boto3 session per member account. Credentials refresh themselves before they expire,
+    # so clients created from a session stay usable for the whole sweep.
+    def __init__(self, role_name=DEFAULT_ROLE_NAME, clients: ClientFactory = None,
+                 session_name=DEFAULT_ROLE_SESSION_NAME, duration=DEFAULT_ROLE_DURATION, external_id=None):
+        self.role_name = role_name
+        self.clients = clients or ClientFactory()
+        self.session_name = session_name
+        self.duration = duration
+        self.external_id = external_id
+        self._sts = self.clients.client("sts")
+        self._partition = self.clients.session.get_partition_for_region(self.clients.region_name or "us-east-1")
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def role_arn(self, account_id) -> str:
+        return f"arn:{self._partition}:iam::{account_id}:role/{self.role_name}"
+
+    def fetch_credentials(self, account_id) -> dict:
+        kwargs = {"RoleArn": self.role_arn(account_id), "RoleSessionName": self.session_name,
+                  "DurationSeconds": self.duration}
+        if self.external_id:
+            kwargs["ExternalId"] = self.external_id
+        credentials = self._sts.assume_role(**kwargs)["Credentials"]
+        return {
+            "access_key": credentials["AccessKeyId"],
+            "secret_key": credentials["SecretAccessKey"],
+            "token": credentials["SessionToken"],
+            "expiry_time": credentials["Expiration"].isoformat(),
+        }
+
+    def get(self, account_id):
+        with self._lock:
+            session = self._sessions.get(account_id)
+        if session is not None:
+            return session
+
+        import boto3
+        from botocore.credentials import RefreshableCredentials
+        from botocore.session import get_session
+
+        credentials = RefreshableCredentials.create_from_metadata(
+            metadata=self.fetch_credentials(account_id),
+            refresh_using=lambda: self.fetch_credentials(account_id),
+            method="sts-assume-role")
+        botocore_session = get_session()
+        botocore_session._credentials = credentials
+        # Reuse the already parsed service models instead of loading them again for every account
+        botocore_session.register_component("data_loader",
+                                            self.clients.session._session.get_component("data_loader"))
+        session = boto3.session.Session(botocore_session=botocore_session, region_name=self.clients.region_name)
+        with self._lock:
+            return self._sessions.setdefault(account_id, session)
+
+    def clear(self):
+        with self._lock:
+            self._sessions.clear()
@@ -0,0 +1,161 @@
+import socket
+import asyncio
+import dataclasses
+import functools
+
+from routefinder.app import RouteFinder, RUNNING_INSTANCE_FILTERS
+from routefinder.dto import Endpoint, RouteFindingResult
+from routefinder.instrumentation import traced
+from routefinder.resolver import addresses_from_addrinfo, is_ipv4
+
+
+# boto3 calls run on a bounded executor and analyses are awaited through the shared poller,
+# so many checks can be in flight without a thread per analysis.
+# Build it with `await AsyncRouteFinder.create(ec2_client)`.
+class AsyncRouteFinder(RouteFinder):
+    def __init__(self, ec2_client, executor=None, **kwargs):
+        super().__init__(ec2_client, preload=False, **kwargs)
+        self._executor = executor
+
+    @classmethod
+    async def create(cls, ec2_client, snapshot=None, refresh=False, **kwargs):
+        route_finder = cls(ec2_client, **kwargs)
+        if snapshot and not refresh and snapshot.restore(route_finder):
+            route_finder.build_indexes()
+        else:
+            await route_finder.load_inventory()
+            if snapshot:
+                snapshot.save(route_finder)
+        if route_finder.journal is not None:
+            route_finder.resume_journal()
+        return route_finder
+
+    async def _call(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    async def apaginate(self, operation_name, **kwargs):
+        pages = iter(self.paginate(operation_name, **kwargs))
+        while True:
+            page = await self._call(next, pages, None)
+            if page is None:
+                return
+            yield page
+
+    @traced
+    async def load_inventory(self, max_workers=None):
+        await asyncio.gather(self.register_igw(), self.register_instances(), self.register_eni(),
+                             self.register_subnets(), self.register_vpcs())
+
+    async def register_igw(self):
+        async for page in self.apaginate("describe_internet_gateways"):
+            self.register_igw_page(page)
+
+    async def register_instances(self):
+        async for page in self.apaginate("describe_instances", Filters=RUNNING_INSTANCE_FILTERS):
+            self.register_instance_page(page)
+
+    async def register_eni(self):
+        async for page in self.apaginate("describe_network_interfaces"):
+            self.register_eni_page(page)
+
+    async def register_subnets(self):
+        async for page in self.apaginate("describe_subnets"):
+            self.register_subnet_page(page)
+
+    async def register_vpcs(self):
+        async for page in self.apaginate("describe_vpcs"):
+            self.register_vpc_page(page)
+
+    async def resolve_hosts(self, fqdn: str) -> list:
+        if is_ipv4(fqdn):
+            return [fqdn]
+        cached = self.resolver.get_cached(fqdn)
+        if cached is not None:
+            return cached
+
+        loop = asyncio.get_running_loop()
+        try:
+            addrinfo = await loop.getaddrinfo(fqdn, None, family=socket.AF_INET, type=socket.SOCK_STREAM)
+        except socket.gaierror as e:
+            self.resolver.store(fqdn, e)
+            raise
+        addresses = addresses_from_addrinfo(addrinfo)
+        self.resolver.store(fqdn, addresses)
+        return addresses
+
+    async def resolve_host(self, fqdn: str) -> str:
+        ip, _ = self.pick_address(await self.resolve_hosts(fqdn))
+        return ip
+
+    async def run_config(self, config, sync_flag=True) -> RouteFindingResult:
+        config.is_valid()
+        if config.source_type == "FQDN":
+            config = dataclasses.replace(config, source_type="IP", source=await self.resolve_host(config.source))
+        if config.destination_type == "FQDN":
+            config = dataclasses.replace(config, destination_type="IP",
+                                         destination=await self.resolve_host(config.destination))
+
+        serialized_config = config.serialize(route_finder=self)
+        return await self.run(sync_flag=sync_flag, **serialized_config)
+
+    @traced
+    async def run(self,
+                  source: Endpoint,
+                  destination: Endpoint = None,
+                  protocol: str = "tcp",
+                  source_ip=None,
+                  destination_ip=None,
+                  destination_port=None,
+                  sync_flag=True,
+                  show_progress=False,
+                  destination_port_range=None):
+        create_network_insights_path_kwargs = self.build_path_kwargs(
+            source=source, destination=destination, protocol=protocol, source_ip=source_ip,
+            destination_ip=destination_ip, destination_port=destination_port,
+            destination_port_range=destination_port_range)
+
+        known_result, journal_key = self.find_known_result(
+            create_network_insights_path_kwargs, source=source, destination=destination, protocol=protocol,
+            destination_ip=destination_ip, destination_port=destination_port,
+            destination_port_range=destination_port_range)
+        if known_result is not None:
+            return await self._call(self.finish_result, create_network_insights_path_kwargs, known_result)
+
+        cached_result, fingerprint = await self._call(self.find_cached_result, create_network_insights_path_kwargs,
+                                                      source=source, destination=destination, sync_flag=sync_flag)
+        if cached_result is not None:
+            return await self._call(self.finish_result, create_network_insights_path_kwargs, cached_result)
+
+        resumed = self._resumed.pop(journal_key, None) if sync_flag else None
+        if resumed is not None:
+            await asyncio.wait([asyncio.wrap_future(resumed)])
+            if resumed.exception() is None:
+                return await self._call(self.finish_result, create_network_insights_path_kwargs, resumed.result(),
+                                        journal_key=journal_key, fingerprint=fingerprint)
+
+        network_insight_path_id, network_insight_analysis_id = await self._call(
+            self.start_journaled_analysis, create_network_insights_path_kwargs, journal_key)
+        finding_result = await self.describe_analysis_sync(network_insight_path_id=network_insight_path_id,
+                                                           network_insight_analysis_id=network_insight_analysis_id,
+                                                           sync_flag=sync_flag)
+        return await self._call(self.finish_result, create_network_insights_path_kwargs, finding_result,
+                                journal_key=journal_key, fingerprint=fingerprint)
+
+    @traced
+    async def describe_analysis_sync(self, network_insight_analysis_id, network_insight_path_id,
+                                     sync_flag=True, show_progress=False) -> RouteFindingResult:
+        if sync_flag:
+            future = self.poller.submit(network_insight_analysis_id=network_insight_analysis_id,
+                                        network_insight_path_id=network_insight_path_id)
+            return await asyncio.wrap_future(future)
+
+        analysis_desc = await self._call(
+            self._proxy.describe_network_insights_analyses,
+            NetworkInsightsAnalysisIds=[network_insight_analysis_id], NetworkInsightsPathId=network_insight_path_id)
+        return RouteFindingResult(
+            network_insight_path_id=network_insight_path_id,
+            network_insight_analysis_id=network_insight_analysis_id,
+            region_name=self._proxy.meta.region_name,
+            detail=analysis_desc
+        )
@@ -1,27 +1,111 @@
 from __future__ import print_function, unicode_literals
 
-import time
-import socket
-from tqdm import tqdm
-from routefinder.dto import Endpoint, EC2Instance, InternetGateways, NetworkInterface, RouteFindingResult
+import json
+import functools
+from concurrent.futures import ThreadPoolExecutor, wait
+from routefinder.dto import Endpoint, EC2Instance, InternetGateways, NetworkInterface, RouteFindingResult, Subnet, Vpc
+from routefinder.instrumentation import Instrumentation, NullInstrumentation, traced
+from routefinder.history import HistoryStore
+from routefinder.journal import AnalysisJournal
+from routefinder.prefix import PrefixIndex
+from routefinder.poller import AnalysisPoller
+from routefinder.polling import PollingStrategy
+from routefinder.registry import PathRegistry
+from routefinder.resolver import DnsResolver
+from routefinder.result_cache import NetworkFingerprint, ResultCache
+from routefinder.scheduler import ApiScheduler, BACKGROUND, with_priority
+
+RUNNING_INSTANCE_FILTERS = [{
+    'Name': 'instance-state-name',
+    'Values': ['running']
+}]
 
 
 class RouteFinder:
-    def __init__(self, ec2_client):
+    def __init__(self, ec2_client, max_workers=3, snapshot=None, refresh=False,
+                 polling: PollingStrategy = None, result_cache: ResultCache = None, preflight=None,
+                 resolver: DnsResolver = None, preload=True, instrumentation: Instrumentation = None,
+                 scheduler: ApiScheduler = None, journal: AnalysisJournal = None, history: HistoryStore = None,
+                 resume=True):
+        if scheduler is not None:
+            ec2_client = scheduler.wrap(ec2_client)
         self._proxy = ec2_client
+        self.instrumentation = instrumentation or NullInstrumentation()
+        self.instrumentation.attach(ec2_client)
         self.instance_map = {}
         self.igw_map = {}
         self.eni_map = {}
         self.ip_map = {}
+        self.subnet_map = {}
+        self.vpc_map = {}
+        self.instance_eni_map = {}
+        self.prefix_index = PrefixIndex()
+        self.poller = AnalysisPoller(ec2_client=ec2_client, strategy=polling)
+        self.path_registry = PathRegistry(ec2_client=ec2_client)
+        self.result_cache = result_cache
+        self.preflight = preflight
+        self.resolver = resolver or DnsResolver()
+        self.fingerprint = NetworkFingerprint(ec2_client=ec2_client)
+        self.journal = journal
+        self._resumed = {}
+        self.history = history
         self.endpoint_map = {
             "EC2": self.instance_map,
             "IGW": self.igw_map,
             "ENI": self.eni_map,
-            "IP": self.ip_map
+            "IP": self.ip_map,
+            "SUBNET": self.subnet_map,
+            "VPC": self.vpc_map
         }
-        self.register_igw()
-        self.register_instances()
-        self.register_eni()
+        if not preload:
+            return
+        if snapshot and not refresh and snapshot.restore(self):
+            self.build_indexes()
+        else:
+            self.load_inventory(max_workers=max_workers)
+            if snapshot:
+                snapshot.save(self)
+        if journal is not None and resume:
+            self.resume_journal()
+
+    @traced
+    def load_inventory(self, max_workers=3):
+        loaders = [self.register_igw, self.register_instances, self.register_eni,
+                   self.register_subnets, self.register_vpcs]
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(with_priority, BACKGROUND, loader) for loader in loaders]
+            for future in futures:
+                future.result()
+
+    def resume_journal(self):
+        # Analyses a previous run left in flight are polled right away, together, instead of being
+        # started again; only those whose source belongs to this inventory (account and region).
+        region_name = self._proxy.meta.region_name or ""
+        endpoint_ids = set().union(*(m.keys() for name, m in self.endpoint_map.items() if name != "IP"))
+
+        def _owned(key):
+            return key[0] == region_name and json.loads(key[1]).get("Source") in endpoint_ids
+
+        self.path_registry.prime({key[1]: path_id for key, path_id in self.journal.paths.items() if _owned(key)})
+        for key, (path_id, analysis_id) in self.journal.pending(region_name).items():
+            if key in self._resumed or not _owned(key):
+                continue
+            future = self.poller.submit(network_insight_analysis_id=analysis_id, network_insight_path_id=path_id,
+                                        resumed=True)
+            future.add_done_callback(functools.partial(self._journal_resumed, key, analysis_id))
+            self._resumed[key] = future
+
+    def _journal_resumed(self, key, network_insight_analysis_id, future):
+        # Also journals resumed analyses nobody asks for again; run() records the ones it returns itself,
+        # since callbacks only run after the waiting caller has been woken up
+        if future.exception() is None:
+            self.journal.record_result(key, future.result())
+        else:
+            self.journal.record_failure(key, network_insight_analysis_id, type(future.exception()).__name__)
+
+    def paginate(self, operation_name, **kwargs):
+        paginator = self._proxy.get_paginator(operation_name)
+        yield from paginator.paginate(**kwargs)
 
     @property
     def igws(self):
@@ -31,6 +115,7 @@ class RouteFinder:
     def instances(self):
         return list(self.instance_map.values())
 
+    @traced
     def run(self,
             source: Endpoint,
             destination: Endpoint = None,
@@ -38,111 +123,308 @@ class RouteFinder:
             source_ip=None,
             destination_ip=None,
             destination_port=None,
-            sync_flag=True):
+            sync_flag=True,
+            show_progress=True,
+            destination_port_range=None):
+
+        create_network_insights_path_kwargs = self.build_path_kwargs(
+            source=source, destination=destination, protocol=protocol, source_ip=source_ip,
+            destination_ip=destination_ip, destination_port=destination_port,
+            destination_port_range=destination_port_range)
+
+        known_result, journal_key = self.find_known_result(
+            create_network_insights_path_kwargs, source=source, destination=destination, protocol=protocol,
+            destination_ip=destination_ip, destination_port=destination_port,
+            destination_port_range=destination_port_range)
+        if known_result is not None:
+            return self.finish_result(create_network_insights_path_kwargs, known_result)
+
+        cached_result, fingerprint = self.find_cached_result(create_network_insights_path_kwargs, source=source,
+                                                             destination=destination, sync_flag=sync_flag)
+        if cached_result is not None:
+            return self.finish_result(create_network_insights_path_kwargs, cached_result)
+
+        resumed = self._resumed.pop(journal_key, None) if sync_flag else None
+        if resumed is not None and self.wait_analysis(resumed, show_progress).exception() is None:
+            return self.finish_result(create_network_insights_path_kwargs, resumed.result(), journal_key=journal_key,
+                                      fingerprint=fingerprint)
+
+        network_insight_path_id, network_insight_analysis_id = self.start_journaled_analysis(
+            create_network_insights_path_kwargs, journal_key)
+        finding_result = self.describe_analysis_sync(network_insight_path_id=network_insight_path_id,
+                                                     network_insight_analysis_id=network_insight_analysis_id,
+                                                     sync_flag=sync_flag,
+                                                     show_progress=show_progress)
+        return self.finish_result(create_network_insights_path_kwargs, finding_result, journal_key=journal_key,
+                                  fingerprint=fingerprint)
 
+    # The steps of run() below are shared with AsyncRouteFinder.run, which only differs in how it waits
+    # on the blocking ones.
+    def find_known_result(self, create_network_insights_path_kwargs: dict, source: Endpoint,
+                          destination: Endpoint = None, protocol="tcp", destination_ip=None, destination_port=None,
+                          destination_port_range=None) -> (RouteFindingResult, tuple):
+        # Results that need no API call: a local pre-flight block, or a result an earlier run journaled.
+        # The local checks evaluate a single port; a range could be partly open.
+        if destination_port_range is None:
+            predicted_result = self.preflight_check(source=source, destination=destination, protocol=protocol,
+                                                    destination_ip=destination_ip, destination_port=destination_port)
+            if predicted_result is not None:
+                return predicted_result, None
+
+        if self.journal is None:
+            return None, None
+        journal_key = self.journal.key(self._proxy.meta.region_name, create_network_insights_path_kwargs)
+        return self.journal.get_result(journal_key), journal_key
+
+    def find_cached_result(self, create_network_insights_path_kwargs: dict, source: Endpoint,
+                           destination: Endpoint = None, sync_flag=True) -> (RouteFindingResult, str):
+        if self.result_cache is None or not sync_flag:
+            return None, None
+        fingerprint = self.network_fingerprint(source=source, destination=destination)
+        return self.result_cache.get(create_network_insights_path_kwargs, fingerprint), fingerprint
+
+    def start_journaled_analysis(self, create_network_insights_path_kwargs: dict, journal_key=None) -> (str, str):
+        network_insight_path_id, network_insight_analysis_id = self.start_analysis(
+            **create_network_insights_path_kwargs)
+        if journal_key:
+            self.journal.record_analysis(journal_key, network_insight_path_id, network_insight_analysis_id)
+        return network_insight_path_id, network_insight_analysis_id
+
+    def finish_result(self, create_network_insights_path_kwargs: dict, result: RouteFindingResult,
+                      journal_key=None, fingerprint=None) -> RouteFindingResult:
+        # A result that is still running (sync_flag=False) leaves its analysis pending in the journal
+        if journal_key and not result.is_running:
+            self.journal.record_result(journal_key, result)
+        if fingerprint and result.is_succeed:
+            self.result_cache.put(create_network_insights_path_kwargs, fingerprint, result)
+        return self.record_history(create_network_insights_path_kwargs, result)
+
+    def record_history(self, create_network_insights_path_kwargs: dict, result: RouteFindingResult):
+        if self.history is not None and not result.is_running:
+            self.history.record(create_network_insights_path_kwargs, result, region_name=self._proxy.meta.region_name)
+        return result
+
+    @traced
+    def preflight_check(self, source: Endpoint, destination: Endpoint = None, protocol: str = "tcp",
+                        destination_ip=None, destination_port=None) -> RouteFindingResult:
+        if self.preflight is None:
+            return None
+        verdict = self.preflight.evaluate(self, source=source, destination=destination, protocol=protocol,
+                                          destination_ip=destination_ip, destination_port=destination_port)
+        if verdict.blocked:
+            return verdict.to_result(region_name=self._proxy.meta.region_name)
+        return None
+
+    @traced
+    def network_fingerprint(self, source: Endpoint, destination: Endpoint = None) -> str:
+        endpoints = [e for e in (source, destination) if isinstance(e, Endpoint)]
+        enis = [eni for endpoint in endpoints for eni in self.get_enis_by_endpoint(endpoint)]
+        vpc_ids = {eni.VpcId for eni in enis}
+        vpc_ids.update(e.VpcId for e in endpoints if isinstance(e, InternetGateways) and e.VpcId)
+        return self.fingerprint.compute(eni_ids=[eni.id for eni in enis], vpc_ids=vpc_ids)
+
+    @staticmethod
+    def build_path_kwargs(source: Endpoint, destination: Endpoint = None, protocol: str = "tcp",
+                          source_ip=None, destination_ip=None, destination_port=None,
+                          destination_port_range=None) -> dict:
         create_network_insights_path_kwargs = {"Source": source.id, "Protocol": protocol}
+        from_port, to_port = destination_port_range or (destination_port, destination_port)
         if isinstance(destination, Endpoint):
-            create_network_insights_path_kwargs["SourceIp"]: source_ip
             create_network_insights_path_kwargs["Destination"] = destination.id
             create_network_insights_path_kwargs["DestinationIp"] = destination_ip
-            create_network_insights_path_kwargs["DestinationPort"] = destination_port
+            if destination_port_range is None:
+                create_network_insights_path_kwargs["SourceIp"] = source_ip
+                create_network_insights_path_kwargs["DestinationPort"] = destination_port
+            else:
+                # A port range is only expressible as a source filter, which excludes SourceIp/DestinationPort
+                create_network_insights_path_kwargs["FilterAtSource"] = {
+                    'DestinationPortRange': {'FromPort': from_port, 'ToPort': to_port}
+                }
         else:
             filter_at_source = {
                 'DestinationAddress': destination_ip,
                 'DestinationPortRange': {
-                    'FromPort': destination_port,
-                    'ToPort': destination_port
+                    'FromPort': from_port,
+                    'ToPort': to_port
                 }
             }
             create_network_insights_path_kwargs["FilterAtSource"] = filter_at_source
 
-        create_network_insights_path_kwargs = {k: v for k, v in create_network_insights_path_kwargs.items() if v}
-        network_insight = self._proxy.create_network_insights_path(**create_network_insights_path_kwargs)
+        return {k: v for k, v in create_network_insights_path_kwargs.items() if v}
 
-        network_insight_path_id = network_insight['NetworkInsightsPath']['NetworkInsightsPathId']
-        network_analysis = self._proxy.start_network_insights_analysis(
-            NetworkInsightsPathId=network_insight_path_id)
+    @traced
+    def start_analysis(self, **create_network_insights_path_kwargs):
+        from botocore.exceptions import ClientError
+
+        network_insight_path_id = self.path_registry.get_or_create(**create_network_insights_path_kwargs)
+        if self.journal is not None:
+            journal_key = self.journal.key(self._proxy.meta.region_name, create_network_insights_path_kwargs)
+            self.journal.record_path(journal_key, network_insight_path_id)
+        try:
+            network_analysis = self._proxy.start_network_insights_analysis(
+                NetworkInsightsPathId=network_insight_path_id)
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "InvalidNetworkInsightsPathId.NotFound":
+                raise
+            # The reused path was deleted since the registry was seeded
+            self.path_registry.forget(**create_network_insights_path_kwargs)
+            network_insight_path_id = self.path_registry.get_or_create(**create_network_insights_path_kwargs)
+            network_analysis = self._proxy.start_network_insights_analysis(
+                NetworkInsightsPathId=network_insight_path_id)
 
         network_insight_analysis_id = network_analysis['NetworkInsightsAnalysis']['NetworkInsightsAnalysisId']
-        finding_result = self.describe_analysis_sync(network_insight_path_id=network_insight_path_id,
-                                                     network_insight_analysis_id=network_insight_analysis_id,
-                                                     sync_flag=sync_flag)
-        return finding_result
+        return network_insight_path_id, network_insight_analysis_id
 
+    @traced
     def describe_analysis_sync(self, network_insight_analysis_id, network_insight_path_id,
-                               sync_flag=True) -> RouteFindingResult:
+                               sync_flag=True, show_progress=True) -> RouteFindingResult:
+        if sync_flag:
+            future = self.poller.submit(network_insight_analysis_id=network_insight_analysis_id,
+                                        network_insight_path_id=network_insight_path_id)
+            return self.wait_analysis(future, show_progress=show_progress).result()
+
         analysis_desc = self._proxy.describe_network_insights_analyses(
             NetworkInsightsAnalysisIds=[network_insight_analysis_id], NetworkInsightsPathId=network_insight_path_id
         )
-
-        response = RouteFindingResult(
+        return RouteFindingResult(
             network_insight_path_id=network_insight_path_id,
             network_insight_analysis_id=network_insight_analysis_id,
             region_name=self._proxy.meta.region_name,
             detail=analysis_desc
         )
 
-        if sync_flag:
-            pbar = tqdm(total=20)
-
-            while response.is_running:
-                time.sleep(1)
-                analysis_desc = self._proxy.describe_network_insights_analyses(
-                    NetworkInsightsAnalysisIds=[network_insight_analysis_id],
-                    NetworkInsightsPathId=network_insight_path_id
-                )
-                response.detail = analysis_desc
-                pbar.update()
-            pbar.update(20)
-        return response
+    def wait_analysis(self, future, show_progress=True):
+        from tqdm import tqdm
 
-    @staticmethod
-    def get_host_by_name(fqdn: str):
-        return socket.gethostbyname(fqdn)
+        pbar = tqdm(total=round(self.poller.expected_duration()), unit="s", disable=not show_progress)
+        while not wait([future], timeout=1).done:
+            pbar.update()
+        pbar.close()
+        return future
+
+    def get_host_by_name(self, fqdn: str):
+        return self.resolver.resolve(fqdn)
+
+    @traced
+    def get_hosts_by_name(self, fqdn: str) -> list:
+        return self.resolver.resolve_all(fqdn)
+
+    def pick_address(self, addresses) -> (str, Endpoint):
+        # Prefer the record that belongs to a registered ENI when a name has several A records
+        owners = [(ip, self.resolve_ip(ip)) for ip in addresses]
+        for ip, owner in owners:
+            if isinstance(owner, NetworkInterface):
+                return ip, owner
+        return owners[0]
+
+    def resolve_name(self, fqdn: str) -> (str, Endpoint):
+        return self.pick_address(self.get_hosts_by_name(fqdn))
 
     def get_eni_by_ip(self, ip):
         if ip not in self.ip_map:
             raise KeyError("Can't find matched ENI")
         return self.ip_map[ip]
 
+    def resolve_ip(self, ip) -> Endpoint:
+        return self.prefix_index.lookup(ip)
+
+    def get_enis_by_endpoint(self, endpoint: Endpoint) -> list:
+        if isinstance(endpoint, NetworkInterface):
+            return [endpoint]
+        return self.instance_eni_map.get(endpoint.id, [])
+
+    def get_label(self, endpoint: Endpoint) -> str:
+        return repr(endpoint)
+
+    def get_raw(self, endpoint: Endpoint) -> dict:
+        operation_name, id_parameter, response_key = endpoint.describe_call
+        response = getattr(self._proxy, operation_name)(**{id_parameter: [endpoint.id]})
+        if isinstance(endpoint, EC2Instance):
+            return response[response_key][0]["Instances"][0]
+        return response[response_key][0]
+
     def get_eni_by_name(self, fqdn) -> NetworkInterface:
-        ip = self.get_host_by_name(fqdn=fqdn)
-        return self.get_eni_by_ip(ip=ip)
+        enis = self.get_enis_by_name(fqdn=fqdn)
+        if not enis:
+            raise KeyError("Can't find matched ENI")
+        return enis[0]
+
+    def get_enis_by_name(self, fqdn) -> list:
+        return [self.ip_map[ip] for ip in self.get_hosts_by_name(fqdn) if ip in self.ip_map]
 
+    @traced
     def register_igw(self):
-        igw_response = self._proxy.describe_internet_gateways()
-        for igw_kwargs in igw_response["InternetGateways"]:
-            _igw = InternetGateways(**igw_kwargs)
-            self.igw_map[_igw.id] = _igw
+        for page in self.paginate("describe_internet_gateways"):
+            self.register_igw_page(page)
 
+    @traced
     def register_instances(self):
-        result = self._proxy.describe_instances(
-            Filters=[{
-                'Name': 'instance-state-name',
-                'Values': ['running']
-            }])
-        k = EC2Instance.__dataclass_fields__.keys()
-        _instances = []
-        try:
-            for r in result["Reservations"]:
-                _inst = r["Instances"][0]
-                _inst_dto = EC2Instance(**{i: _inst[i] for i in set(k).intersection(_inst.keys())})
-                self.instance_map[_inst_dto.id] = _inst_dto
-        except KeyError:
-            _instances = []
+        for page in self.paginate("describe_instances", Filters=RUNNING_INSTANCE_FILTERS):
+            self.register_instance_page(page)
 
+    @traced
     def register_eni(self):
-        result = self._proxy.describe_network_interfaces()
-        k = NetworkInterface.__dataclass_fields__.keys()
-        _instances = []
-        try:
-            for row in result['NetworkInterfaces']:
-                _eni_dto = NetworkInterface(**{i: row[i] for i in set(k).intersection(row.keys())})
-                self.eni_map[_eni_dto.id] = _eni_dto
-
-                for _private_ip in _eni_dto.PrivateIpAddresses:
-                    self.ip_map[_private_ip] = _eni_dto
-                if _eni_dto.has_eip:
-                    self.ip_map[_eni_dto.Association["PublicIp"]] = _eni_dto
-        except KeyError:
-            _instances = []
+        for page in self.paginate("describe_network_interfaces"):
+            self.register_eni_page(page)
+
+    @traced
+    def register_subnets(self):
+        for page in self.paginate("describe_subnets"):
+            self.register_subnet_page(page)
+
+    @traced
+    def register_vpcs(self):
+        for page in self.paginate("describe_vpcs"):
+            self.register_vpc_page(page)
+
+    def register_igw_page(self, page):
+        for row in page["InternetGateways"]:
+            _igw = InternetGateways.from_response(row)
+            self.igw_map[_igw.id] = _igw
+
+    def register_instance_page(self, page):
+        for r in page.get("Reservations", ()):
+            for row in r["Instances"]:
+                _inst_dto = EC2Instance.from_response(row)
+                self.instance_map[_inst_dto.id] = _inst_dto
+
+    def register_eni_page(self, page):
+        for row in page.get("NetworkInterfaces", ()):
+            self.index_eni(NetworkInterface.from_response(row))
+
+    def register_subnet_page(self, page):
+        for row in page["Subnets"]:
+            _subnet_dto = Subnet.from_response(row)
+            self.subnet_map[_subnet_dto.id] = _subnet_dto
+            self.prefix_index.insert(_subnet_dto.CidrBlock, _subnet_dto)
+
+    def register_vpc_page(self, page):
+        for row in page["Vpcs"]:
+            _vpc_dto = Vpc.from_response(row)
+            self.vpc_map[_vpc_dto.id] = _vpc_dto
+            for cidr_block in _vpc_dto.cidr_blocks:
+                self.prefix_index.insert(cidr_block, _vpc_dto)
+
+    def index_eni(self, _eni_dto: NetworkInterface):
+        self.eni_map[_eni_dto.id] = _eni_dto
+        if _eni_dto.InstanceId:
+            self.instance_eni_map.setdefault(_eni_dto.InstanceId, []).append(_eni_dto)
+
+        for _private_ip in _eni_dto.PrivateIpAddresses:
+            self.ip_map[_private_ip] = _eni_dto
+            self.prefix_index.insert(_private_ip, _eni_dto)
+        if _eni_dto.has_eip:
+            self.ip_map[_eni_dto.PublicIp] = _eni_dto
+            self.prefix_index.insert(_eni_dto.PublicIp, _eni_dto)
+
+    def build_indexes(self):
+        self.instance_eni_map.clear()
+        for _eni_dto in self.eni_map.values():
+            if _eni_dto.InstanceId:
+                self.instance_eni_map.setdefault(_eni_dto.InstanceId, []).append(_eni_dto)
+
+        # Built aside and swapped in, so lookups never see a half-built index
+        prefix_index = PrefixIndex((cidr, vpc) for vpc in self.vpc_map.values() for cidr in vpc.cidr_blocks)
+        prefix_index.update((subnet.CidrBlock, subnet) for subnet in self.subnet_map.values())
+        prefix_index.update(self.ip_map.items())
+        self.prefix_index = prefix_index
@@ -0,0 +1,39 @@
+import threading
+
+DEFAULT_MAX_POOL_CONNECTIONS = 50
+DEFAULT_RETRY_MODE = "adaptive"
+DEFAULT_MAX_ATTEMPTS = 10
+
+
+class ClientFactory:
+    # Shares one session and hands out one client per (service, region, credential set).
+    # Clients are thread-safe once created; creating them is not, so creation is serialized.
+    def __init__(self, session=None, config=None, max_pool_connections=DEFAULT_MAX_POOL_CONNECTIONS,
+                 tcp_keepalive=True, retry_mode=DEFAULT_RETRY_MODE, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        import boto3
+        from botocore.config import Config
+
+        self.session = session or boto3.session.Session()
+        tuned = Config(max_pool_connections=max_pool_connections, tcp_keepalive=tcp_keepalive,
+                       retries={"mode": retry_mode, "max_attempts": max_attempts})
+        self.config = tuned.merge(config) if config is not None else tuned
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    @property
+    def region_name(self):
+        return self.config.region_name or self.session.region_name
+
+    def client(self, service_name, region_name=None, session=None):
+        session = session or self.session
+        key = (service_name, region_name, session)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                client = self._clients[key] = session.client(service_name, region_name=region_name,
+                                                             config=self.config)
+        return client
+
+    def clear(self):
+        with self._lock:
+            self._clients.clear()
@@ -1,82 +1,128 @@
-from typing import List
-from dataclasses import dataclass, field
+import sys
+from typing import Tuple
+from dataclasses import dataclass, field, fields
 from .formatter import AnalyzedOutputFormatter
 
 
+def slotted(cls):
+    # Equivalent of dataclass(slots=True), which needs Python 3.10+
+    field_names = tuple(f.name for f in fields(cls))
+    cls_dict = {k: v for k, v in cls.__dict__.items() if k not in field_names + ("__dict__", "__weakref__")}
+    cls_dict["__slots__"] = field_names
+    return type(cls)(cls.__name__, cls.__bases__, cls_dict)
+
+
+def intern(value):
+    return sys.intern(value) if value else ""
+
+
+def get_tag(tags, key="Name"):
+    for t in tags or ():
+        if t["Key"] == key:
+            return t["Value"]
+    return ""
+
+
 @dataclass
 class Endpoint:
+    __slots__ = ()
+    # (operation, id parameter, response key) used to fetch the full payload on demand
+    describe_call = None
+
     @property
     def id(self):
         raise NotImplementedError("Endpoint must have id")
 
 
+@slotted
 @dataclass
 class InternetGateways(Endpoint):
-    Name: str = field(init=False, repr=True)
-    VpcId: str = field(init=False, repr=True)
-    InternetGatewayId: str = field(repr=True)
-    OwnerId: str
-    Tags: list = field(repr=False)
-    Attachments: list = field(repr=False)
-
-    def __post_init__(self):
-        self.Name, self.VpcId = "", ""
-        for t in self.Tags:
-            if t["Key"] == "Name":
-                self.Name = t["Value"]
-                break
-
-        for _attach in self.Attachments:
+    Name: str
+    VpcId: str
+    InternetGatewayId: str
+    OwnerId: str = field(repr=False, default="")
+
+    describe_call = ("describe_internet_gateways", "InternetGatewayIds", "InternetGateways")
+
+    @classmethod
+    def from_response(cls, row):
+        vpc_id = ""
+        for _attach in row.get("Attachments", ()):
             if _attach["State"] == "available":
-                self.VpcId = _attach["VpcId"]
+                vpc_id = _attach["VpcId"]
+        return cls(Name=get_tag(row.get("Tags")), VpcId=intern(vpc_id), InternetGatewayId=row["InternetGatewayId"],
+                   OwnerId=intern(row.get("OwnerId")))
 
     @property
     def id(self):
         return self.InternetGatewayId
 
 
+@slotted
 @dataclass
 class EC2Instance(Endpoint):
-    Name: str = field(init=False, repr=True)
+    Name: str
     ImageId: str = field(repr=False)
     InstanceId: str
     InstanceType: str = field(repr=False)
     PrivateIpAddress: str
-    Tags: list = field(repr=False)
     PublicIpAddress: str = ""
     Platform: str = ""
+    SubnetId: str = field(repr=False, default="")
+    VpcId: str = field(repr=False, default="")
 
-    def __post_init__(self):
-        for t in self.Tags:
-            if t["Key"] == "Name":
-                self.Name = t["Value"]
-                break
+    describe_call = ("describe_instances", "InstanceIds", "Reservations")
+
+    @classmethod
+    def from_response(cls, row):
+        return cls(Name=get_tag(row.get("Tags")), ImageId=intern(row.get("ImageId")), InstanceId=row["InstanceId"],
+                   InstanceType=intern(row.get("InstanceType")), PrivateIpAddress=row.get("PrivateIpAddress", ""),
+                   PublicIpAddress=row.get("PublicIpAddress", ""), Platform=intern(row.get("Platform")),
+                   SubnetId=intern(row.get("SubnetId")), VpcId=intern(row.get("VpcId")))
 
     @property
     def id(self):
         return self.InstanceId
 
 
+@slotted
 @dataclass
 class NetworkInterface(Endpoint):
     NetworkInterfaceId: str
     InterfaceType: str
     OwnerId: str = field(repr=False)
     PrivateIpAddress: str
-    PrivateIpAddresses: List[str]
+    PrivateIpAddresses: Tuple[str, ...]
     Status: str
     SubnetId: str = field(repr=False)
     VpcId: str = field(repr=False)
     AvailabilityZone: str = field(repr=False)
-    SourceDestCheck: str = field(repr=False, default="")
-    PrivateDnsName: str = field(repr=False, default="")
+    SourceDestCheck: bool = field(repr=False, default=True)
     Description: str = ""
-    Groups: List[str] = field(repr=False, default=list)
-    MacAddress: str = field(repr=False, default="")
-    Attachment: dict = field(default_factory=dict, repr=False)
-    Association: dict = field(default_factory=dict, repr=False)
-
-    # Deny_all_igw_traffic: str
+    GroupIds: Tuple[str, ...] = field(repr=False, default=())
+    InstanceId: str = field(repr=False, default="")
+    PublicIp: str = field(repr=False, default="")
+
+    describe_call = ("describe_network_interfaces", "NetworkInterfaceIds", "NetworkInterfaces")
+
+    @classmethod
+    def from_response(cls, row):
+        return cls(
+            NetworkInterfaceId=row["NetworkInterfaceId"],
+            InterfaceType=intern(row.get("InterfaceType")),
+            OwnerId=intern(row.get("OwnerId")),
+            PrivateIpAddress=row.get("PrivateIpAddress", ""),
+            PrivateIpAddresses=tuple(ip["PrivateIpAddress"] for ip in row.get("PrivateIpAddresses", ())),
+            Status=intern(row.get("Status")),
+            SubnetId=intern(row.get("SubnetId")),
+            VpcId=intern(row.get("VpcId")),
+            AvailabilityZone=intern(row.get("AvailabilityZone")),
+            SourceDestCheck=row.get("SourceDestCheck", True),
+            Description=row.get("Description", ""),
+            GroupIds=tuple(intern(g["GroupId"]) for g in row.get("Groups", ())),
+            InstanceId=row.get("Attachment", {}).get("InstanceId", ""),
+            PublicIp=row.get("Association", {}).get("PublicIp", ""),
+        )
 
     @property
     def id(self):
@@ -84,13 +130,61 @@ class NetworkInterface(Endpoint):
 
     @property
     def has_eip(self):
-        return bool(self.Association)
+        return bool(self.PublicIp)
+
+    @property
+    def group_ids(self):
+        return self.GroupIds
+
+
+@slotted
+@dataclass
+class Subnet(Endpoint):
+    SubnetId: str
+    VpcId: str
+    CidrBlock: str
+    AvailabilityZone: str = field(repr=False, default="")
+    OwnerId: str = field(repr=False, default="")
+
+    describe_call = ("describe_subnets", "SubnetIds", "Subnets")
+
+    @classmethod
+    def from_response(cls, row):
+        return cls(SubnetId=row["SubnetId"], VpcId=intern(row.get("VpcId")), CidrBlock=row["CidrBlock"],
+                   AvailabilityZone=intern(row.get("AvailabilityZone")), OwnerId=intern(row.get("OwnerId")))
+
+    @property
+    def id(self):
+        return self.SubnetId
 
-    def __post_init__(self):
-        _PrivateIpAddresses = [ip['PrivateIpAddress'] for ip in self.PrivateIpAddresses]
-        self.PrivateIpAddresses = _PrivateIpAddresses
 
+@slotted
+@dataclass
+class Vpc(Endpoint):
+    VpcId: str
+    CidrBlock: str
+    OwnerId: str = field(repr=False, default="")
+    CidrBlocks: Tuple[str, ...] = field(repr=False, default=())
+
+    describe_call = ("describe_vpcs", "VpcIds", "Vpcs")
+
+    @classmethod
+    def from_response(cls, row):
+        cidr_blocks = tuple(a["CidrBlock"] for a in row.get("CidrBlockAssociationSet", ())
+                            if a.get("CidrBlockState", {}).get("State", "associated") == "associated")
+        return cls(VpcId=intern(row["VpcId"]), CidrBlock=row["CidrBlock"], OwnerId=intern(row.get("OwnerId")),
+                   CidrBlocks=cidr_blocks)
+
+    @property
+    def id(self):
+        return self.VpcId
 
+    @property
+    def cidr_blocks(self):
+        return self.CidrBlocks or (self.CidrBlock,)
+
+
+@slotted
 @dataclass
 class InternetProtocolAddress(Endpoint):
     IpAddress: str
@@ -106,9 +200,15 @@ class RouteFindingResult:
     network_insight_analysis_id: str
     detail: dict
     region_name: str = ""
+    timed_out: bool = False
+    elapsed: float = None
+    cached: bool = False
+    predicted: bool = False
 
     @property
     def status(self):
+        if self.timed_out:
+            return "timed-out"
         return self.detail["NetworkInsightsAnalyses"][0]["Status"]
 
     @property
@@ -135,30 +235,66 @@ class RouteFindingResult:
         console_url += f"#NetworkPath:pathId={self.network_insight_path_id}"
         return console_url
 
-    def get_result(self, detail=False):
-        headline = AnalyzedOutputFormatter.get_headline(is_reachable=self.is_reachable)
+    @property
+    def explanation_codes(self):
+        if self.is_running or self.is_reachable:
+            return []
+        return [item["ExplanationCode"] for item in self.detail["NetworkInsightsAnalyses"][0].get("Explanations", [])]
+
+    def to_dict(self):
+        return {
+            "network_insight_path_id": self.network_insight_path_id,
+            "network_insight_analysis_id": self.network_insight_analysis_id,
+            "region_name": self.region_name,
+            "status": self.status,
+            "is_reachable": None if self.is_running else self.is_reachable,
+            "explanation_codes": self.explanation_codes,
+            "console_url": self.console_url,
+            "elapsed": self.elapsed,
+            "cached": self.cached,
+            "predicted": self.predicted,
+        }
+
+    def iter_result(self, detail=False):
         console_url = f"console url: {self.console_url}"
-        explanation = self.get_explain()
-
-        lines = [headline, console_url, explanation]
+        if self.timed_out:
+            yield AnalyzedOutputFormatter.get_timeout_headline(elapsed=self.elapsed)
+            yield console_url
+            return
+
+        yield AnalyzedOutputFormatter.get_headline(is_reachable=self.is_reachable)
+        if self.predicted:
+            yield "(predicted by the local pre-flight check: no analysis was run)"
+        else:
+            if self.cached:
+                yield "(cached result: network configuration unchanged since the last analysis)"
+            yield console_url
+        yield from self.iter_explain()
         if detail:
-            summary = self.get_forward_path_summary()
-            lines.append(summary)
-        return "\n".join(lines)
+            yield from self.iter_forward_path_summary()
 
-    def get_explain(self):
+    def get_result(self, detail=False):
+        return "\n".join(self.iter_result(detail=detail))
+
+    def iter_explain(self):
         if self.is_reachable:
-            return "No Issue Found"
-        return f"Reasons:\n" + AnalyzedOutputFormatter.explain(
-            self.detail["NetworkInsightsAnalyses"][0]["Explanations"])
+            yield "No Issue Found"
+            return
+        yield "Reasons:"
+        yield from AnalyzedOutputFormatter.iter_explain(self.detail["NetworkInsightsAnalyses"][0]["Explanations"])
 
-    def get_forward_path_summary(self):
+    def get_explain(self):
+        return "\n".join(self.iter_explain())
+
+    def iter_forward_path_summary(self):
         if self.is_running:
             raise RuntimeError("RouteFinding Analysis is running")
 
         if self.detail["NetworkInsightsAnalyses"][0]["NetworkPathFound"]:
-            summary = AnalyzedOutputFormatter.summarize(
+            yield from AnalyzedOutputFormatter.iter_summary(
                 entry=self.detail["NetworkInsightsAnalyses"][0]["ForwardPathComponents"])
         else:
-            summary = "Network Path Not Found"
-        return summary
+            yield "Network Path Not Found"
+
+    def get_forward_path_summary(self):
+        return "\n".join(self.iter_forward_path_summary())
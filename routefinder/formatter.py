@@ -1,6 +1,3 @@
-import emoji
-
-
 def summarize_component(component):
     return f"Component ID: {component['Id']}, ARN: {component['Arn']}, Name: {component.get('Name', 'N/A')}"
 
@@ -99,6 +96,8 @@ EXPLANATION_CODE_MAP = {
 class AnalyzedOutputFormatter:
     @classmethod
     def get_headline(cls, is_reachable: bool):
+        import emoji
+
         if is_reachable:
             head_line = f"{emoji.emojize(':check_mark_button:')} Network Route is reachable!\n"
         else:
@@ -106,31 +105,39 @@ class AnalyzedOutputFormatter:
         return head_line
 
     @classmethod
-    def summarize(cls, entry):
-        summary = [
-            "Route Path Detail:"
-        ]
+    def get_timeout_headline(cls, elapsed: float):
+        import emoji
+
+        return f"{emoji.emojize(':hourglass_done:')} Analysis did not finish in {elapsed:.0f} seconds\n"
+
+    @classmethod
+    def iter_summary(cls, entry):
+        import emoji
+
+        key, gear, link = emoji.emojize(":key:"), emoji.emojize(":gear:"), emoji.emojize(":link:")
+        yield "Route Path Detail:"
         for item in entry:
-            sequence_number = item.pop('SequenceNumber')
-            component = item.pop('Component')
-            summary.append(emoji.emojize(f":key: Sequence Number: {sequence_number}"))
-            if component:
-                summary.append(emoji.emojize(f":gear: {summarize_component(component)}"))
-            for k in list(item.keys()):
-                summary.append(
-                    emoji.emojize(f":link: {k}: {item.pop(k)}")
-                )
-            summary.append("\n")
-        return "\n".join(summary)
+            yield f"{key} Sequence Number: {item['SequenceNumber']}"
+            if item.get('Component'):
+                yield f"{gear} {summarize_component(item['Component'])}"
+            for k, v in item.items():
+                if k not in ('SequenceNumber', 'Component'):
+                    yield f"{link} {k}: {v}"
+            yield "\n"
 
     @classmethod
-    def explain(cls, explanations):
-        messages = []
+    def summarize(cls, entry):
+        return "\n".join(cls.iter_summary(entry))
+
+    @classmethod
+    def iter_explain(cls, explanations):
         for item in explanations:
-            explanation_code = item.pop("ExplanationCode")
-            message = f"[{explanation_code}] - "
-            message += EXPLANATION_CODE_MAP.get(explanation_code, "Unknown issue.")
-            message += f"\nContext: {item}\n"
-            messages.append(message)
-        messages.append("\n")
-        return "\n".join(messages)
+            explanation_code = item["ExplanationCode"]
+            context = {k: v for k, v in item.items() if k != "ExplanationCode"}
+            yield f"[{explanation_code}] - {EXPLANATION_CODE_MAP.get(explanation_code, 'Unknown issue.')}" \
+                  f"\nContext: {context}\n"
+        yield "\n"
+
+    @classmethod
+    def explain(cls, explanations):
+        return "\n".join(cls.iter_explain(explanations))
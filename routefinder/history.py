@@ -0,0 +1,246 @@
+import os
+import json
+import time
+import zlib
+import sqlite3
+import hashlib
+import threading
+
+from routefinder.dto import RouteFindingResult
+from routefinder.registry import canonicalize_path
+from routefinder.snapshot import DEFAULT_SNAPSHOT_DIR
+
+DEFAULT_HISTORY_PATH = os.path.join(DEFAULT_SNAPSHOT_DIR, "history.sqlite")
+
+HISTORY_FIELDS = ("id", "run_id", "recorded_at", "region_name", "source", "destination", "destination_ip",
+                  "protocol", "from_port", "to_port", "status", "is_reachable", "explanation_codes",
+                  "network_insight_path_id", "network_insight_analysis_id", "cached", "predicted")
+DIFF_FIELDS = ("change", "source", "destination", "destination_ip", "protocol", "from_port", "to_port",
+               "before_status", "after_status", "before_reachable", "after_reachable", "before_explanation_codes",
+               "after_explanation_codes", "before_analysis_id", "after_analysis_id")
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS runs ("
+    " run_id INTEGER PRIMARY KEY, label TEXT, started_at REAL NOT NULL)",
+    # detail (explanations, forward/return path components) is a compressed blob kept in the last column,
+    # so listing and diffing never have to read it
+    "CREATE TABLE IF NOT EXISTS results ("
+    " id INTEGER PRIMARY KEY, run_id INTEGER NOT NULL, recorded_at REAL NOT NULL, path_key BLOB NOT NULL,"
+    " region_name TEXT, source TEXT, destination TEXT, destination_ip TEXT, protocol TEXT,"
+    " from_port INTEGER, to_port INTEGER, status TEXT, is_reachable INTEGER, explanation_codes TEXT,"
+    " network_insight_path_id TEXT, network_insight_analysis_id TEXT, cached INTEGER, predicted INTEGER,"
+    " detail BLOB)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS results_run_path ON results (run_id, path_key)",
+    # Covers both sides of a diff, so comparing two runs never reads the table itself
+    "CREATE INDEX IF NOT EXISTS results_run_verdict ON results (run_id, path_key, is_reachable, explanation_codes)",
+    "CREATE INDEX IF NOT EXISTS results_source ON results (source, destination, from_port, recorded_at)",
+    "CREATE INDEX IF NOT EXISTS results_destination ON results (destination, from_port, recorded_at)",
+    "CREATE INDEX IF NOT EXISTS results_destination_ip ON results (destination_ip, from_port, recorded_at)",
+    "CREATE INDEX IF NOT EXISTS results_recorded_at ON results (recorded_at)",
+    "CREATE INDEX IF NOT EXISTS results_verdict ON results (is_reachable, recorded_at)",
+)
+
+
+def _port_range(create_network_insights_path_kwargs: dict):
+    port_range = create_network_insights_path_kwargs.get("FilterAtSource", {}).get("DestinationPortRange")
+    if port_range:
+        return port_range.get("FromPort"), port_range.get("ToPort")
+    port = create_network_insights_path_kwargs.get("DestinationPort")
+    return port, port
+
+
+def _destination_ip(create_network_insights_path_kwargs: dict):
+    return create_network_insights_path_kwargs.get("DestinationIp") or \
+        create_network_insights_path_kwargs.get("FilterAtSource", {}).get("DestinationAddress")
+
+
+def path_digest(create_network_insights_path_kwargs: dict) -> bytes:
+    return hashlib.blake2b(canonicalize_path(create_network_insights_path_kwargs).encode(), digest_size=16).digest()
+
+
+def _reachable(row):
+    if row is None or row["is_reachable"] is None:
+        return None
+    return bool(row["is_reachable"])
+
+
+def _change(before, after) -> str:
+    if before is None:
+        return "added"
+    if after is None:
+        return "removed"
+    if _reachable(after) is True:
+        return "opened"
+    if _reachable(before) is True and _reachable(after) is False:
+        return "closed"
+    return "changed"
+
+
+class HistoryStore:
+    # Every result RouteFinder returns is appended to the current run; runs are compared per path
+    # definition through the (run_id, path_key) index, so a diff only touches the two runs' rows.
+    def __init__(self, path=DEFAULT_HISTORY_PATH):
+        self.path = path
+        self.run_id = None
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        for statement in SCHEMA:
+            self._conn.execute(statement)
+        self._conn.commit()
+
+    def start_run(self, label=None) -> int:
+        # The label names what the run checked (e.g. a batch file); only runs with the same label are
+        # compared by default
+        with self._lock:
+            return self._start_run(label)
+
+    def _start_run(self, label=None) -> int:
+        cursor = self._conn.execute("INSERT INTO runs (label, started_at) VALUES (?, ?)", (label, time.time()))
+        self._conn.commit()
+        self.run_id = cursor.lastrowid
+        return self.run_id
+
+    def record(self, create_network_insights_path_kwargs: dict, result: RouteFindingResult, region_name=None):
+        kwargs = create_network_insights_path_kwargs
+        from_port, to_port = _port_range(kwargs)
+        is_reachable = None if result.is_running else result.is_reachable
+        row = (
+            time.time(), path_digest(kwargs), result.region_name or region_name,
+            kwargs.get("Source"), kwargs.get("Destination"), _destination_ip(kwargs), kwargs.get("Protocol"),
+            from_port, to_port, result.status,
+            None if is_reachable is None else int(is_reachable), ";".join(result.explanation_codes),
+            result.network_insight_path_id, result.network_insight_analysis_id,
+            int(result.cached), int(result.predicted),
+            zlib.compress(json.dumps(result.detail, default=str).encode()),
+        )
+        with self._lock:
+            # Checked and created under the lock: batch and matrix workers record concurrently, and all of
+            # an invocation's results belong to one run
+            if self.run_id is None:
+                self._start_run()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (run_id, recorded_at, path_key, region_name, source, destination,"
+                " destination_ip, protocol, from_port, to_port, status, is_reachable, explanation_codes,"
+                " network_insight_path_id, network_insight_analysis_id, cached, predicted, detail)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", (self.run_id,) + row)
+            self._conn.commit()
+
+    def runs(self, limit=20) -> list:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT runs.run_id, label, started_at, (SELECT COUNT(*) FROM results WHERE run_id = runs.run_id)"
+                " AS results FROM runs ORDER BY run_id DESC LIMIT ?", (limit,)).fetchall()
+        return [dict(row) for row in rows]
+
+    def query(self, source=None, destination=None, destination_ip=None, destination_port=None, since=None,
+              until=None, reachable=None, run_id=None, limit=1000) -> list:
+        conditions, parameters = [], []
+        for column, value in (("source", source), ("destination", destination), ("destination_ip", destination_ip),
+                              ("run_id", run_id)):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                parameters.append(value)
+        if destination_port is not None:
+            conditions.append("from_port <= ? AND to_port >= ?")
+            parameters.extend([destination_port, destination_port])
+        if since is not None:
+            conditions.append("recorded_at >= ?")
+            parameters.append(since)
+        if until is not None:
+            conditions.append("recorded_at < ?")
+            parameters.append(until)
+        if reachable is not None:
+            conditions.append("is_reachable = ?")
+            parameters.append(int(reachable))
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(HISTORY_FIELDS)} FROM results{where} ORDER BY recorded_at DESC LIMIT ?",
+                parameters + [limit]).fetchall()
+        return [dict(row) for row in rows]
+
+    def get_result(self, entry_id) -> RouteFindingResult:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT network_insight_path_id, network_insight_analysis_id, region_name, detail, cached, predicted"
+                " FROM results WHERE id = ?", (entry_id,)).fetchone()
+        if row is None:
+            return None
+        return RouteFindingResult(
+            network_insight_path_id=row["network_insight_path_id"],
+            network_insight_analysis_id=row["network_insight_analysis_id"],
+            region_name=row["region_name"],
+            detail=json.loads(zlib.decompress(row["detail"])),
+            cached=bool(row["cached"]),
+            predicted=bool(row["predicted"]),
+        )
+
+    def latest_run_ids(self, count=2) -> list:
+        with self._lock:
+            rows = self._conn.execute("SELECT run_id FROM runs ORDER BY run_id DESC LIMIT ?", (count,)).fetchall()
+        return [row["run_id"] for row in reversed(rows)]
+
+    def latest_comparable_run_ids(self) -> list:
+        # The two latest runs of the most recent label that was run at least twice; unlabeled runs
+        # (interactive or server queries) check arbitrary paths and are never compared by default
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT run_id FROM runs WHERE label = ("
+                " SELECT a.label FROM runs a WHERE a.label IS NOT NULL AND EXISTS ("
+                "  SELECT 1 FROM runs b WHERE b.label = a.label AND b.run_id < a.run_id)"
+                " ORDER BY a.run_id DESC LIMIT 1)"
+                " ORDER BY run_id DESC LIMIT 2").fetchall()
+        return [row["run_id"] for row in reversed(rows)]
+
+    def changed_path_keys(self, run_id, other_run_id) -> list:
+        # Answered from the covering index alone; the planner would otherwise pick the unique index
+        # and read every row of both runs from the table
+        return [row[0] for row in self._conn.execute(
+            "SELECT a.path_key FROM results a INDEXED BY results_run_verdict WHERE a.run_id = ? AND NOT EXISTS ("
+            " SELECT 1 FROM results b INDEXED BY results_run_verdict WHERE b.run_id = ? AND b.path_key = a.path_key"
+            " AND b.is_reachable IS a.is_reachable AND b.explanation_codes IS a.explanation_codes)",
+            (run_id, other_run_id))]
+
+    def _rows(self, run_id, path_keys) -> dict:
+        rows = {}
+        for path_key in path_keys:
+            row = self._conn.execute(
+                "SELECT source, destination, destination_ip, protocol, from_port, to_port, status, is_reachable,"
+                " explanation_codes, network_insight_analysis_id FROM results WHERE run_id = ? AND path_key = ?",
+                (run_id, path_key)).fetchone()
+            if row is not None:
+                rows[path_key] = row
+        return rows
+
+    def diff(self, before_run_id, after_run_id) -> list:
+        # Paths whose verdict or explanations differ between the runs, plus paths only one run checked
+        with self._lock:
+            path_keys = set(self.changed_path_keys(before_run_id, after_run_id))
+            path_keys.update(self.changed_path_keys(after_run_id, before_run_id))
+            before, after = self._rows(before_run_id, path_keys), self._rows(after_run_id, path_keys)
+
+        changes = []
+        for path_key in path_keys:
+            old, new = before.get(path_key), after.get(path_key)
+            row = new or old
+            changes.append({
+                "change": _change(old, new),
+                **{k: row[k] for k in ("source", "destination", "destination_ip", "protocol", "from_port",
+                                       "to_port")},
+                "before_status": old and old["status"], "after_status": new and new["status"],
+                "before_reachable": _reachable(old), "after_reachable": _reachable(new),
+                "before_explanation_codes": old and old["explanation_codes"],
+                "after_explanation_codes": new and new["explanation_codes"],
+                "before_analysis_id": old and old["network_insight_analysis_id"],
+                "after_analysis_id": new and new["network_insight_analysis_id"],
+            })
+        return sorted(changes, key=lambda c: (c["source"] or "", c["destination"] or c["destination_ip"] or "",
+                                              c["from_port"] or 0))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
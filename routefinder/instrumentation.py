@@ -0,0 +1,164 @@
+import json
+import time
+import inspect
+import threading
+import functools
+from contextlib import contextmanager, nullcontext
+from collections import defaultdict
+
+from routefinder.polling import LatencyHistogram
+
+API_LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30)
+THROTTLE_ERROR_CODES = frozenset(["Throttling", "ThrottlingException", "RequestLimitExceeded",
+                                  "TooManyRequestsException", "RequestThrottled", "RequestThrottledException"])
+
+
+def traced(method):
+    if inspect.iscoroutinefunction(method):
+        @functools.wraps(method)
+        async def async_wrapper(self, *args, **kwargs):
+            with self.instrumentation.span(method.__name__):
+                return await method(self, *args, **kwargs)
+        return async_wrapper
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.instrumentation.span(method.__name__):
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+def payload_size(http_response):
+    if http_response is None:
+        return 0
+    try:
+        return len(http_response.content or b"")
+    except AttributeError:
+        # Stubbed responses have no body to measure
+        return 0
+
+
+class ApiCallStats:
+    def __init__(self):
+        self.latency = LatencyHistogram(buckets=API_LATENCY_BUCKETS)
+        self.errors = 0
+        self.retries = 0
+        self.throttles = 0
+        self.payload_bytes = 0
+
+    def to_dict(self):
+        return {
+            "latency": self.latency.to_dict(),
+            "errors": self.errors,
+            "retries": self.retries,
+            "throttles": self.throttles,
+            "payload_bytes": self.payload_bytes,
+        }
+
+
+class NullInstrumentation:
+    def attach(self, client):
+        pass
+
+    def span(self, name, **attributes):
+        return nullcontext()
+
+
+class Instrumentation:
+    # Collects per-operation API metrics through botocore event hooks plus timing spans,
+    # and exports them as a summary or a Chrome trace (chrome://tracing, ui.perfetto.dev).
+    def __init__(self):
+        self.api_calls = defaultdict(ApiCallStats)
+        self.spans = defaultdict(lambda: LatencyHistogram(buckets=API_LATENCY_BUCKETS))
+        self._events = []
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+
+    def attach(self, client):
+        events = getattr(client.meta, "events", None)
+        if events is None:
+            return
+        unique_id = f"routefinder-instrumentation-{id(self)}"
+        events.register("before-call", self._before_call, unique_id=f"{unique_id}-before")
+        events.register("after-call", self._after_call, unique_id=f"{unique_id}-after")
+        events.register("after-call-error", self._after_call_error, unique_id=f"{unique_id}-error")
+        events.register("needs-retry", self._needs_retry, unique_id=f"{unique_id}-retry")
+
+    def _before_call(self, model, context, **kwargs):
+        context["routefinder_call"] = (model.name, time.perf_counter())
+
+    def _finish_call(self, context, error=False, parsed=None, http_response=None):
+        operation_name, started = context.pop("routefinder_call", (None, None))
+        if started is None:
+            return
+        finished = time.perf_counter()
+        with self._lock:
+            stats = self.api_calls[operation_name]
+            stats.latency.record(finished - started)
+            stats.errors += error
+            if parsed is not None:
+                stats.retries += parsed.get("ResponseMetadata", {}).get("RetryAttempts", 0)
+            stats.payload_bytes += payload_size(http_response)
+        self._add_event(operation_name, "api", started, finished)
+
+    def _after_call(self, context, parsed=None, http_response=None, **kwargs):
+        error = http_response is not None and http_response.status_code >= 300
+        self._finish_call(context, error=error, parsed=parsed, http_response=http_response)
+
+    def _after_call_error(self, context, **kwargs):
+        self._finish_call(context, error=True)
+
+    def _needs_retry(self, response=None, operation=None, **kwargs):
+        if response is None or operation is None:
+            return None
+        code = response[1].get("Error", {}).get("Code")
+        if code in THROTTLE_ERROR_CODES:
+            with self._lock:
+                self.api_calls[operation.name].throttles += 1
+        return None
+
+    def _add_event(self, name, category, started, finished, **attributes):
+        with self._lock:
+            self._events.append({
+                "name": name, "cat": category, "ph": "X", "pid": 1, "tid": threading.get_ident(),
+                "ts": (started - self._origin) * 1e6, "dur": (finished - started) * 1e6, "args": attributes,
+            })
+
+    @contextmanager
+    def span(self, name, **attributes):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            finished = time.perf_counter()
+            with self._lock:
+                self.spans[name].record(finished - started)
+            self._add_event(name, "span", started, finished, **attributes)
+
+    def summary(self) -> dict:
+        with self._lock:
+            return {
+                "api_calls": {name: stats.to_dict() for name, stats in sorted(self.api_calls.items())},
+                "spans": {name: histogram.to_dict() for name, histogram in sorted(self.spans.items())},
+            }
+
+    def format_summary(self) -> str:
+        summary = self.summary()
+        lines = [f"{'API call':<42}{'calls':>7}{'mean(s)':>9}{'p90(s)':>9}{'retries':>9}{'throttles':>11}"
+                 f"{'errors':>8}{'bytes':>12}"]
+        for name, stats in summary["api_calls"].items():
+            latency = stats["latency"]
+            lines.append(f"{name:<42}{latency['count']:>7}{latency['mean']:>9.3f}{latency['p90']:>9.3f}"
+                         f"{stats['retries']:>9}{stats['throttles']:>11}{stats['errors']:>8}"
+                         f"{stats['payload_bytes']:>12}")
+        lines.append("")
+        lines.append(f"{'Span':<42}{'calls':>7}{'mean(s)':>9}{'p90(s)':>9}")
+        for name, latency in summary["spans"].items():
+            lines.append(f"{name:<42}{latency['count']:>7}{latency['mean']:>9.3f}{latency['p90']:>9.3f}")
+        return "\n".join(lines)
+
+    def write_trace(self, path):
+        with self._lock:
+            events = list(self._events)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "otherData": self.summary()}, f)
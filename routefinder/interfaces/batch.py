@@ -0,0 +1,103 @@
+import os
+import csv
+import json
+import socket
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from routefinder.dto import NetworkInterface
+from routefinder.scheduler import BATCH, scheduling_priority
+from routefinder.interfaces.config import CommandConfig
+
+SPEC_FIELDS = ("source_type", "source", "destination_type", "destination", "protocol", "destination_port")
+FQDN_FIELDS = ("source_fqdn", "destination_fqdn")
+DEFAULT_CONCURRENCY = 8
+
+
+def load_specs(path) -> list:
+    ext = os.path.splitext(path)[1].lower()
+    with open(path, encoding="utf-8") as f:
+        if ext in (".yaml", ".yml"):
+            import yaml
+
+            specs = yaml.safe_load(f) or []
+            if isinstance(specs, dict):
+                specs = specs.get("paths", [])
+        elif ext == ".csv":
+            specs = list(csv.DictReader(f))
+        elif ext in (".jsonl", ".ndjson"):
+            specs = [json.loads(line) for line in f if line.strip()]
+        else:
+            raise ValueError(f"Unsupported batch file format: {ext}(yaml, csv, jsonl)")
+    return specs
+
+
+class BatchRunner:
+    def __init__(self, command, max_workers=DEFAULT_CONCURRENCY):
+        self.command = command
+        self.max_workers = max_workers
+
+    def build_config(self, spec: dict) -> CommandConfig:
+        missing = {"source_type", "source", "destination_type", "destination"}.difference(spec)
+        if missing:
+            raise ValueError(f"Missing batch spec fields: {', '.join(sorted(missing))}")
+        return self.command.config_factory.build(
+            source_type=spec["source_type"], source=spec["source"],
+            destination_type=spec["destination_type"], destination=spec["destination"],
+            protocol=spec.get("protocol") or "tcp",
+            destination_port=int(spec.get("destination_port") or 80))
+
+    def run_spec(self, spec: dict, priority=BATCH) -> dict:
+        record = {k: spec.get(k) for k in SPEC_FIELDS}
+        record.update({k: spec[k] for k in FQDN_FIELDS if k in spec})
+        try:
+            config = self.build_config(spec)
+            record.update({k: getattr(config, k) for k in SPEC_FIELDS})
+            with scheduling_priority(priority):
+                result = self.command.run(config, sync_flag=True, show_progress=False)
+            record.update(result.to_dict())
+        except Exception as e:
+            record["error"] = f"{type(e).__name__}: {e}"
+        return record
+
+    def prefetch_names(self, specs):
+        names = [spec[k] for spec in specs for k in ("source", "destination")
+                 if spec.get(f"{k}_type") == "FQDN" and spec.get(k)]
+        if names:
+            self.command.route_finder.resolver.resolve_many(names)
+
+    def registered_addresses(self, fqdn) -> list:
+        route_finder = self.command.route_finder
+        try:
+            addresses = route_finder.get_hosts_by_name(fqdn)
+        except socket.gaierror:
+            return []
+        return [ip for ip in addresses if isinstance(route_finder.resolve_ip(ip), NetworkInterface)]
+
+    def expand_spec(self, spec: dict) -> list:
+        # A name whose A records belong to several registered ENIs (e.g. load-balancer nodes) is checked once
+        # per address, recorded under {source,destination}_fqdn; other names are resolved by CommandConfig
+        specs = [spec]
+        for k in ("source", "destination"):
+            if spec.get(f"{k}_type") != "FQDN" or not spec.get(k):
+                continue
+            addresses = self.registered_addresses(spec[k])
+            if len(addresses) > 1:
+                specs = [{**s, f"{k}_type": "IP", k: ip, f"{k}_fqdn": spec[k]} for s in specs for ip in addresses]
+        return specs
+
+    def run(self, specs):
+        specs = list(specs)
+        self.prefetch_names(specs)
+        specs = [expanded for spec in specs for expanded in self.expand_spec(spec)]
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        try:
+            futures = [executor.submit(self.run_spec, spec) for spec in specs]
+            for future in as_completed(futures):
+                yield future.result()
+        finally:
+            # On Ctrl-C (or a consumer that stops early) the queued specs must not start: each one is a
+            # paid analysis whose result nobody would read
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def write(self, specs, writer) -> int:
+        return writer.write_all(self.run(specs))
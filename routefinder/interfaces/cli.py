@@ -1,17 +1,34 @@
 from __future__ import print_function, unicode_literals
 
+import os
+import re
 import socket
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 
-import regex
-import boto3
-from InquirerPy import inquirer
-from InquirerPy.base.control import Choice
-from prompt_toolkit.validation import ValidationError
 from routefinder.app import RouteFinder, RouteFindingResult
+from routefinder.clients import ClientFactory
+from routefinder.history import HistoryStore
+from routefinder.instrumentation import Instrumentation, NullInstrumentation
+from routefinder.journal import AnalysisJournal
+from routefinder.polling import PollingStrategy
+from routefinder.preflight import PreflightEvaluator
+from routefinder.result_cache import ResultCache, DEFAULT_RESULT_CACHE_SIZE
+from routefinder.scheduler import ApiScheduler
+from routefinder.snapshot import InventorySnapshot, DEFAULT_SNAPSHOT_DIR, DEFAULT_SNAPSHOT_TTL
+from routefinder.sweep import PortSweep, DEFAULT_SWEEP_CONCURRENCY
 from routefinder.interfaces.config import CommandConfigFactory, CommandConfig
 
+SOURCE_TYPE_NAMES = {
+    "EC2": "Amazon EC2 Instance",
+    "IP": "IP Address on AWS",
+    "FQDN": "FQDN on AWS",
+}
+
 
 def validate_available_source(available_source):
+    from prompt_toolkit.validation import ValidationError
+
     if not available_source:
         raise ValidationError(
             message="No Available Source Resource Found(Check EC2, NetworkInterface, InternetGateway)")
@@ -19,7 +36,9 @@ def validate_available_source(available_source):
 
 
 def validate_ip(ip: str):
-    pattern_ok = regex.match("^\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}$", ip)
+    from prompt_toolkit.validation import ValidationError
+
+    pattern_ok = re.match("^\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}$", ip)
     if not pattern_ok:
         raise ValidationError(message='Please enter a valid IP')
     return True
@@ -27,13 +46,15 @@ def validate_ip(ip: str):
 
 def validate_fqdn(route_finder: RouteFinder, fqdn):
     try:
-        host = route_finder.get_host_by_name(fqdn)
+        route_finder.get_hosts_by_name(fqdn)
         return True
     except socket.gaierror:
         return False
 
 
 def validate_registered_ip(route_finder: RouteFinder, ip: str):
+    from prompt_toolkit.validation import ValidationError
+
     validate_ip(ip)
 
     is_registered_ip = route_finder.ip_map.get(ip)
@@ -43,43 +64,155 @@ def validate_registered_ip(route_finder: RouteFinder, ip: str):
 
 
 def validate_registered_fqdn(route_finder, fqdn):
+    from prompt_toolkit.validation import ValidationError
+
     if validate_fqdn(route_finder=route_finder, fqdn=fqdn):
-        host = route_finder.get_host_by_name(fqdn)
-        return validate_registered_ip(route_finder=route_finder, ip=host)
+        if route_finder.get_enis_by_name(fqdn):
+            return True
+        raise ValidationError(message='Unregistered IP')
     raise ValidationError(message='Unregistered FQDN')
 
 
 class RouteFinderCommand:
-    def __init__(self, boto_config=None):
-        client = boto3.client("ec2", config=boto_config)
-        self.route_finder = RouteFinder(ec2_client=client)
-        self.available_sources = self.get_available_sources()
+    def __init__(self, boto_config=None, refresh=False, snapshot_ttl=DEFAULT_SNAPSHOT_TTL,
+                 polling: PollingStrategy = None, result_ttl=0, result_cache_size=DEFAULT_RESULT_CACHE_SIZE,
+                 preflight=False, regions=None, session=None, account_id=None, clients: ClientFactory = None,
+                 instrumentation: Instrumentation = None, scheduler: ApiScheduler = None,
+                 journal: AnalysisJournal = None, history: HistoryStore = None):
+        self.boto_config = boto_config
+        self.instrumentation = instrumentation or NullInstrumentation()
+        # Every query, batch job and inventory load of this account draws from the same API budget
+        self.scheduler = scheduler or ApiScheduler()
+        self.journal = journal
+        self.history = history
+        # Kept across reloads, so a refreshing server doesn't open a new connection per region each time
+        self._result_caches = {}
+        self._result_caches_lock = threading.Lock()
+        self.clients = clients
+        self.regions = regions
+        self.session = session
+        self.account_id = account_id
+        self.refresh = refresh
+        self.snapshot_ttl = snapshot_ttl
+        self.polling = polling
+        self.result_ttl = result_ttl
+        self.result_cache_size = result_cache_size
+        self.preflight = preflight
         self.config_factory = CommandConfigFactory(command=self)
+        self._available_sources = None
+
+        # Inventory loads in the background while the first prompts are answered. A daemon thread rather than
+        # an executor worker, which would be joined at exit and hold up Ctrl-C at the first prompt.
+        self._route_finder_future = Future()
+        threading.Thread(target=self._load_in_background, args=(self._route_finder_future,),
+                         name="routefinder-inventory", daemon=True).start()
+
+    def _load_in_background(self, future: Future):
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(self.load_route_finder())
+        except BaseException as e:
+            future.set_exception(e)
+
+    def load_route_finder(self, refresh=None, resume=True) -> RouteFinder:
+        refresh = self.refresh if refresh is None else refresh
+        clients = self.clients or ClientFactory(config=self.boto_config)
+        client = clients.client("ec2", session=self.session)
+        account_id = self.account_id
+        if account_id is None and (self.snapshot_ttl > 0 or self.result_ttl > 0):
+            account_id = clients.client("sts", session=self.session).get_caller_identity()["Account"]
+        if not self.regions:
+            return self.build_route_finder(client, account_id, refresh, resume)
+
+        from routefinder.regions import MultiRegionRouteFinder, list_enabled_regions
+
+        regions = list_enabled_regions(client) if self.regions == ["all"] else self.regions
+        with ThreadPoolExecutor(max_workers=min(8, len(regions)),
+                                thread_name_prefix="routefinder-region") as executor:
+            futures = {region_name: executor.submit(self.build_route_finder,
+                                                    clients.client("ec2", region_name=region_name,
+                                                                   session=self.session), account_id, refresh,
+                                                    resume)
+                       for region_name in regions}
+            return MultiRegionRouteFinder({region_name: f.result() for region_name, f in futures.items()})
+
+    def get_result_cache(self, account_id, region_name) -> ResultCache:
+        with self._result_caches_lock:
+            result_cache = self._result_caches.get((account_id, region_name))
+            if result_cache is None:
+                os.makedirs(DEFAULT_SNAPSHOT_DIR, exist_ok=True)
+                result_cache = self._result_caches[(account_id, region_name)] = ResultCache(
+                    path=os.path.join(DEFAULT_SNAPSHOT_DIR, f"results-{account_id}-{region_name}.sqlite"),
+                    ttl=self.result_ttl, max_entries=self.result_cache_size)
+        return result_cache
+
+    def build_route_finder(self, client, account_id=None, refresh=False, resume=True) -> RouteFinder:
+        snapshot, result_cache = None, None
+        client = self.scheduler.wrap(client)
+        region_name = client.meta.region_name
+        if self.snapshot_ttl > 0:
+            snapshot = InventorySnapshot(account_id=account_id, region_name=region_name, ttl=self.snapshot_ttl)
+        if self.result_ttl > 0:
+            result_cache = self.get_result_cache(account_id, region_name)
+        preflight = PreflightEvaluator(ec2_client=client).load() if self.preflight else None
+        return RouteFinder(ec2_client=client, snapshot=snapshot, refresh=refresh, polling=self.polling,
+                           result_cache=result_cache, preflight=preflight, instrumentation=self.instrumentation,
+                           scheduler=self.scheduler, journal=self.journal, history=self.history, resume=resume)
+
+    def reload(self) -> RouteFinder:
+        # The current inventory keeps serving until the new one is fully loaded. Journaled analyses were
+        # already resumed by the first load and are still being polled there.
+        route_finder = self.load_route_finder(refresh=True, resume=False)
+        future = Future()
+        future.set_result(route_finder)
+        self._route_finder_future = future
+        self._available_sources = None
+        return route_finder
+
+    @property
+    def route_finder(self) -> RouteFinder:
+        return self._route_finder_future.result()
+
+    @property
+    def available_sources(self):
+        if self._available_sources is None:
+            self._available_sources = self.get_available_sources()
+        return self._available_sources
 
     def get_available_sources(self):
+        from InquirerPy.base.control import Choice
+        from prompt_toolkit.validation import ValidationError
+
         has_instance = bool(self.route_finder.instance_map)
         has_ip = bool(self.route_finder.ip_map)
 
         available_sources = [
-            Choice("EC2", name="Amazon EC2 Instance", enabled=not has_instance),
-            Choice("IP", name="IP Address on AWS", enabled=not has_ip),
-            Choice("FQDN", name="FQDN on AWS", enabled=not has_ip),
+            Choice("EC2", name=SOURCE_TYPE_NAMES["EC2"], enabled=not has_instance),
+            Choice("IP", name=SOURCE_TYPE_NAMES["IP"], enabled=not has_ip),
+            Choice("FQDN", name=SOURCE_TYPE_NAMES["FQDN"], enabled=not has_ip),
         ]
         if not has_ip and not has_instance:
             raise ValidationError(message="No Available Resources on target region")
         return available_sources
 
     def ask_source(self):
+        from InquirerPy import inquirer
+        from InquirerPy.base.control import Choice
+        from prompt_toolkit.validation import ValidationError
+
         source = ""
         source_type = inquirer.select(
             message="Select SourceType",
-            choices=self.available_sources
+            choices=[Choice(k, name=v) for k, v in SOURCE_TYPE_NAMES.items()]
         ).execute()
+        validate_available_source(self.available_sources)
 
         if source_type == "EC2":
             source = inquirer.select(
                 message="Select Target EC2",
-                choices=[Choice(k, name=repr(v)) for k, v in self.route_finder.instance_map.items()]
+                choices=[Choice(k, name=self.route_finder.get_label(v))
+                         for k, v in self.route_finder.instance_map.items()]
             ).execute()
         elif source_type == "IP":
             source = inquirer.text(
@@ -96,6 +229,10 @@ class RouteFinderCommand:
         return source, source_type
 
     def ask_destination(self):
+        from InquirerPy import inquirer
+        from InquirerPy.base.control import Choice
+        from prompt_toolkit.validation import ValidationError
+
         destination_type = inquirer.select(
             message="Select DestinationType",
             choices=[
@@ -107,7 +244,8 @@ class RouteFinderCommand:
         if destination_type == "EC2":
             destination = inquirer.select(
                 message="Select Target EC2",
-                choices=[Choice(k, name=repr(v)) for k, v in self.route_finder.instance_map.items()]
+                choices=[Choice(k, name=self.route_finder.get_label(v))
+                         for k, v in self.route_finder.instance_map.items()]
             ).execute()
         elif destination_type == "FQDN":
             destination = inquirer.text(
@@ -120,24 +258,29 @@ class RouteFinderCommand:
             raise ValidationError(message="Destination must be set")
         return destination, destination_type
 
-    def setup(self):
+    def setup(self, ask_port=True):
+        from InquirerPy import inquirer
+
         source, source_type = self.ask_source()
         destination, destination_type = self.ask_destination()
         protocol = inquirer.select(
             message="select Protocol", choices=["tcp", "udp"]).execute()
-        destination_port = inquirer.number(
-            message="Input destination PortNumber",
-            default=80,
-            validate=lambda port: port.isnumeric() and 0 <= int(port) <= 65535
-        ).execute()
+        destination_port = 80
+        if ask_port:
+            destination_port = inquirer.number(
+                message="Input destination PortNumber",
+                default=80,
+                validate=lambda port: port.isnumeric() and 0 <= int(port) <= 65535
+            ).execute()
 
         return self.config_factory.build(source_type=source_type, source=source,
                                          destination_type=destination_type, destination=destination,
                                          protocol=protocol, destination_port=destination_port)
 
-    def run(self, config: CommandConfig, sync_flag=True) -> RouteFindingResult:
+    def run(self, config: CommandConfig, sync_flag=True, show_progress=True) -> RouteFindingResult:
         config.is_valid()
-        serialized_config = config.serialize(route_finder=self.route_finder)
+        with self.instrumentation.span("serialize"):
+            serialized_config = config.serialize(route_finder=self.route_finder)
         analysis_result = self.route_finder.run(
             source=serialized_config["source"],
             destination=serialized_config["destination"],
@@ -145,10 +288,21 @@ class RouteFinderCommand:
             source_ip=serialized_config["source_ip"],
             destination_ip=serialized_config["destination_ip"],
             destination_port=serialized_config["destination_port"],
-            sync_flag=sync_flag)
+            sync_flag=sync_flag,
+            show_progress=show_progress)
 
         return analysis_result
 
+    def sweep(self, config: CommandConfig, from_port=1, to_port=65535, max_workers=DEFAULT_SWEEP_CONCURRENCY) -> list:
+        config.is_valid()
+        serialized_config = config.serialize(route_finder=self.route_finder)
+        port_sweep = PortSweep(route_finder=self.route_finder, max_workers=max_workers)
+        return port_sweep.sweep(source=serialized_config["source"],
+                                destination=serialized_config["destination"],
+                                destination_ip=serialized_config["destination_ip"],
+                                protocol=serialized_config["protocol"],
+                                from_port=from_port, to_port=to_port)
+
 
 if __name__ == "__main__":
     command = RouteFinderCommand()
@@ -1,18 +1,28 @@
-from botocore.config import Config
+from typing import TYPE_CHECKING
 from dataclasses import dataclass
-from prompt_toolkit.validation import ValidationError
 
-from routefinder.dto import Endpoint
+from routefinder.dto import Endpoint, NetworkInterface
+
+if TYPE_CHECKING:
+    from botocore.config import Config
 
 
 def map_source(route_finder, source_type, source) -> (Endpoint, str):
+    from prompt_toolkit.validation import ValidationError
+
     if source_type not in {"EC2", "IP", "FQDN"}:
         raise ValidationError(message="source_type must be EC2 or IP on AWS")
+    if source_type == "EC2":
+        return route_finder.endpoint_map[source_type][source], ""
+
     if source_type == "FQDN":
-        source = route_finder.get_host_by_name(source)
-        source_type = "IP"
-    mapped_source = route_finder.endpoint_map[source_type][source]
-    return mapped_source, ""
+        source, owner = route_finder.resolve_name(source)
+    else:
+        owner = route_finder.resolve_ip(source)
+    if not isinstance(owner, NetworkInterface):
+        location = f" (in {owner.id})" if owner is not None else ""
+        raise KeyError(f"{source}{location} is not assigned to any registered NetworkInterface")
+    return owner, ""
 
 
 def map_destination(route_finder, destination_type, destination) -> (Endpoint, str):
@@ -22,12 +32,10 @@ def map_destination(route_finder, destination_type, destination) -> (Endpoint, s
 
     # Analyzer based on IP Address
     if destination_type in ["FQDN", "IP"]:
-        if destination in route_finder.ip_map:
-            destination = route_finder.get_eni_by_name(destination)
-            return destination, ""
-        else:
-            destination_ip = route_finder.get_host_by_name(fqdn=destination)
-            return None, destination_ip
+        destination_ip, owner = route_finder.resolve_name(destination)
+        if isinstance(owner, NetworkInterface):
+            return owner, ""
+        return None, destination_ip
 
 
 @dataclass
@@ -40,7 +48,7 @@ class CommandConfig:
     destination_ip: str = ""
     destination_port: int = 80
     protocol: str = "tcp"
-    boto_config: Config = None
+    boto_config: "Config" = None
     sync_flag: bool = True
 
     def serialize(self, route_finder):
@@ -0,0 +1,72 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from routefinder.accounts import AssumedRoleSessions
+from routefinder.interfaces.batch import BatchRunner, DEFAULT_CONCURRENCY
+from routefinder.interfaces.cli import RouteFinderCommand
+
+DEFAULT_FLEET_CONCURRENCY = 4
+
+
+def normalize_account_id(account_id) -> str:
+    # YAML reads bare account IDs as integers and drops their leading zeros
+    return str(account_id).strip().zfill(12)
+
+
+class AccountFleet:
+    def __init__(self, sessions: AssumedRoleSessions, accounts, max_workers=DEFAULT_FLEET_CONCURRENCY,
+                 concurrency=DEFAULT_CONCURRENCY, **command_kwargs):
+        self.sessions = sessions
+        self.accounts = [normalize_account_id(account_id) for account_id in accounts]
+        self.max_workers = max_workers
+        self.concurrency = concurrency
+        self.command_kwargs = command_kwargs
+        self.command_kwargs.setdefault("clients", sessions.clients)
+        self._commands = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+
+    def command(self, account_id) -> RouteFinderCommand:
+        with self._lock:
+            command = self._commands.get(account_id)
+        if command is None:
+            command = RouteFinderCommand(session=self.sessions.get(account_id), account_id=account_id,
+                                         **self.command_kwargs)
+            with self._lock:
+                command = self._commands.setdefault(account_id, command)
+        return command
+
+    def specs_for(self, specs, account_id) -> list:
+        return [spec for spec in specs
+                if not spec.get("account") or normalize_account_id(spec["account"]) == account_id]
+
+    def run_account(self, account_id, specs) -> list:
+        records = []
+        if not specs:
+            return records
+        try:
+            runner = BatchRunner(command=self.command(account_id), max_workers=self.concurrency)
+            for record in runner.run(specs):
+                record["account"] = account_id
+                records.append(record)
+                if self._stopped.is_set():
+                    break
+        except Exception as e:
+            records.append({"account": account_id, "error": f"{type(e).__name__}: {e}"})
+        return records
+
+    def run(self, specs):
+        specs = list(specs)
+        executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="routefinder-account")
+        try:
+            futures = [executor.submit(self.run_account, account_id, self.specs_for(specs, account_id))
+                       for account_id in self.accounts]
+            for future in as_completed(futures):
+                yield from future.result()
+        finally:
+            # Accounts already running stop after their in-flight specs; queued ones never start
+            self._stopped.set()
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def write(self, specs, writer) -> int:
+        return writer.write_all(self.run(specs))
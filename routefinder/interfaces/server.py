@@ -0,0 +1,143 @@
+import sys
+import json
+import time
+import threading
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from routefinder.scheduler import INTERACTIVE
+from routefinder.interfaces.batch import BatchRunner, SPEC_FIELDS
+from routefinder.interfaces.cli import RouteFinderCommand
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8421
+DEFAULT_REFRESH_INTERVAL = 900
+
+
+class RouteFinderService:
+    # Keeps one warm inventory, refreshes it in the background and lets identical
+    # in-flight queries share a single analysis.
+    def __init__(self, command: RouteFinderCommand, refresh_interval=DEFAULT_REFRESH_INTERVAL):
+        self.command = command
+        self.runner = BatchRunner(command=command)
+        self.refresh_interval = refresh_interval
+        self.loaded_at = None
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._refresher = None
+
+    def start(self):
+        self.command.route_finder  # block until the initial inventory is loaded
+        self.loaded_at = time.time()
+        if self.refresh_interval > 0:
+            self._refresher = threading.Thread(target=self._refresh_loop, name="routefinder-refresh", daemon=True)
+            self._refresher.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+
+    def _refresh_loop(self):
+        while not self._stopped.wait(self.refresh_interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Inventory refresh failed, keeping the previous one: {type(e).__name__}: {e}", file=sys.stderr)
+
+    def refresh(self):
+        with self._refresh_lock:
+            self.command.reload()
+            self.loaded_at = time.time()
+
+    def analyze(self, spec: dict) -> dict:
+        config = self.runner.build_config(spec)
+        key = tuple(getattr(config, k) for k in SPEC_FIELDS)
+        with self._lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+
+        if owner:
+            try:
+                future.set_result(self.runner.run_spec(spec, priority=INTERACTIVE))
+            except BaseException as e:
+                future.set_exception(e)
+                raise
+            finally:
+                with self._lock:
+                    self._inflight.pop(key, None)
+
+        record = dict(future.result())
+        record["coalesced"] = not owner
+        return record
+
+    def health(self) -> dict:
+        route_finder = self.command.route_finder
+        return {
+            "status": "ok",
+            "inventory_age": round(time.time() - self.loaded_at, 1) if self.loaded_at else None,
+            "inflight": len(self._inflight),
+            "endpoints": {k: len(v) for k, v in route_finder.endpoint_map.items()},
+        }
+
+
+class RouteFinderRequestHandler(BaseHTTPRequestHandler):
+    server_version = "RouteFinder"
+
+    @property
+    def service(self) -> RouteFinderService:
+        return self.server.service
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def do_GET(self):
+        if self.path == "/healthz":
+            self.send_json(200, self.service.health())
+        else:
+            self.send_json(404, {"error": f"Unknown path: {self.path}"})
+
+    def do_POST(self):
+        if self.path == "/analyses":
+            try:
+                record = self.service.analyze(self.read_json())
+            except (ValueError, TypeError) as e:
+                self.send_json(400, {"error": f"{type(e).__name__}: {e}"})
+                return
+            self.send_json(422 if "error" in record else 200, record)
+        elif self.path == "/refresh":
+            try:
+                self.service.refresh()
+            except Exception as e:
+                # Same as a failed background refresh: the previous inventory keeps serving
+                self.send_json(502, {"error": f"Inventory refresh failed: {type(e).__name__}: {e}"})
+                return
+            self.send_json(200, self.service.health())
+        else:
+            self.send_json(404, {"error": f"Unknown path: {self.path}"})
+
+
+def serve(command: RouteFinderCommand, host=DEFAULT_HOST, port=DEFAULT_PORT,
+          refresh_interval=DEFAULT_REFRESH_INTERVAL):
+    service = RouteFinderService(command=command, refresh_interval=refresh_interval).start()
+    httpd = ThreadingHTTPServer((host, port), RouteFinderRequestHandler)
+    httpd.daemon_threads = True
+    httpd.service = service
+    print(f"RouteFinder listening on http://{host}:{httpd.server_port}", file=sys.stderr)
+    try:
+        httpd.serve_forever()
+    finally:
+        service.stop()
+        httpd.server_close()
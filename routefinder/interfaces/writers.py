@@ -0,0 +1,47 @@
+import os
+import csv
+import json
+
+from routefinder.interfaces.batch import SPEC_FIELDS, FQDN_FIELDS
+
+RESULT_FIELDS = ("network_insight_path_id", "network_insight_analysis_id", "region_name", "status", "is_reachable",
+                 "explanation_codes", "console_url", "elapsed", "cached", "predicted")
+CSV_FIELDS = ("account",) + SPEC_FIELDS + FQDN_FIELDS + RESULT_FIELDS + ("error",)
+
+
+class JsonLinesWriter:
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, record: dict):
+        self.stream.write(json.dumps(record, default=str) + "\n")
+        self.stream.flush()
+
+    def write_all(self, records) -> int:
+        count = 0
+        for record in records:
+            self.write(record)
+            count += 1
+        return count
+
+
+class CsvWriter(JsonLinesWriter):
+    def __init__(self, stream, fieldnames=CSV_FIELDS):
+        super().__init__(stream)
+        self._writer = csv.DictWriter(stream, fieldnames=fieldnames, extrasaction="ignore")
+        self._writer.writeheader()
+
+    def write(self, record: dict):
+        self._writer.writerow({k: ";".join(v) if isinstance(v, (list, tuple)) else v for k, v in record.items()})
+        self.stream.flush()
+
+
+WRITERS = {"jsonl": JsonLinesWriter, "csv": CsvWriter}
+
+
+def get_writer(stream, output_format=None, path=None, fieldnames=CSV_FIELDS):
+    if output_format is None:
+        output_format = "csv" if path and os.path.splitext(path)[1].lower() == ".csv" else "jsonl"
+    if output_format == "csv":
+        return CsvWriter(stream, fieldnames=fieldnames)
+    return WRITERS[output_format](stream)
@@ -0,0 +1,122 @@
+import os
+import json
+import time
+import threading
+
+from routefinder.dto import RouteFindingResult
+from routefinder.registry import canonicalize_path
+from routefinder.result_cache import DEFAULT_RESULT_TTL
+
+
+class AnalysisJournal:
+    # Append-only JSON Lines log of created paths, started analyses and finished results.
+    # Every record is flushed (and fsynced) before the call that produced it returns, so after
+    # a crash the journal holds at most one torn last line, which load() skips.
+    def __init__(self, path, fsync=True, ttl=DEFAULT_RESULT_TTL):
+        self.path = path
+        self.fsync = fsync
+        self.ttl = ttl
+        self.paths = {}
+        self.analyses = {}
+        self.results = {}
+        self.recorded_at = {}
+        self.started_at = {}
+        self.failures = {}
+        self._lock = threading.Lock()
+        self.load()
+        self._stream = open(path, "a", encoding="utf-8")
+        if self._stream.tell() and not self._ends_with_newline():
+            self._stream.write("\n")
+
+    @staticmethod
+    def key(region_name, create_network_insights_path_kwargs: dict) -> tuple:
+        return region_name or "", canonicalize_path(create_network_insights_path_kwargs)
+
+    def _ends_with_newline(self):
+        with open(self.path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b"\n"
+
+    def load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            return
+        for line in lines:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            self.apply(record)
+
+    def apply(self, record: dict):
+        key = record["region"], record["path"]
+        event = record["event"]
+        if event == "path":
+            self.paths[key] = record["path_id"]
+        elif event == "analysis":
+            self.paths[key] = record["path_id"]
+            self.analyses[key] = (record["path_id"], record["analysis_id"])
+            self.started_at[key] = record["at"]
+        elif event == "result":
+            self.results[key] = record["result"]
+            self.recorded_at[key] = record["at"]
+        elif event == "failure":
+            self.failures[key] = record["analysis_id"]
+
+    def append(self, event, key, **fields):
+        record = {"event": event, "region": key[0], "path": key[1], "at": time.time(), **fields}
+        line = json.dumps(record, default=str) + "\n"
+        with self._lock:
+            self.apply(record)
+            self._stream.write(line)
+            self._stream.flush()
+            if self.fsync:
+                os.fsync(self._stream.fileno())
+
+    def record_path(self, key, network_insight_path_id):
+        if self.paths.get(key) != network_insight_path_id:
+            self.append("path", key, path_id=network_insight_path_id)
+
+    def record_analysis(self, key, network_insight_path_id, network_insight_analysis_id):
+        self.append("analysis", key, path_id=network_insight_path_id, analysis_id=network_insight_analysis_id)
+
+    def record_result(self, key, result: RouteFindingResult):
+        # Only succeeded results are reused. An analysis AWS reports as failed is closed, so it isn't polled
+        # again on every resume; a running or timed-out one (only our deadline expired) stays pending.
+        if result.status == "failed":
+            self.record_failure(key, result.network_insight_analysis_id, result.status)
+        elif result.is_succeed and self.results.get(key, {}).get("network_insight_analysis_id") != \
+                result.network_insight_analysis_id:
+            self.append("result", key, result={
+                "network_insight_path_id": result.network_insight_path_id,
+                "network_insight_analysis_id": result.network_insight_analysis_id,
+                "region_name": result.region_name,
+                "detail": result.detail,
+                "elapsed": result.elapsed,
+            })
+
+    def record_failure(self, key, network_insight_analysis_id, reason):
+        self.append("failure", key, analysis_id=network_insight_analysis_id, reason=reason)
+
+    def get_result(self, key) -> RouteFindingResult:
+        payload = self.results.get(key)
+        if payload is None or time.time() - self.recorded_at[key] >= self.ttl:
+            return None
+        return RouteFindingResult(cached=True, **payload)
+
+    def pending(self, region_name=None) -> dict:
+        # Analyses that were started but never reached a result or failure in the journal. Ones older than
+        # the TTL are left alone: their verdict would be journaled as if it were fresh.
+        now = time.time()
+        with self._lock:
+            return {key: ids for key, ids in self.analyses.items()
+                    if (region_name is None or key[0] == (region_name or ""))
+                    and now - self.started_at[key] < self.ttl
+                    and self.results.get(key, {}).get("network_insight_analysis_id") != ids[1]
+                    and self.failures.get(key) != ids[1]}
+
+    def close(self):
+        with self._lock:
+            self._stream.close()
@@ -0,0 +1,184 @@
+import random
+import itertools
+from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from routefinder.app import RUNNING_INSTANCE_FILTERS
+from routefinder.dto import Endpoint
+from routefinder.scheduler import BATCH, scheduling_priority
+
+MATRIX_FIELDS = ("source", "destination", "source_class", "destination_class", "protocol", "destination_port",
+                 "status", "is_reachable", "explanation_codes", "network_insight_analysis_id", "representative",
+                 "verified", "error")
+DEFAULT_MATRIX_CONCURRENCY = 8
+
+
+def parse_tag_filters(expression: str) -> list:
+    # "tier=web,env=prod" -> EC2 tag filters; "tier" alone matches any value
+    filters = []
+    for term in filter(None, (t.strip() for t in expression.split(","))):
+        key, _, value = term.partition("=")
+        if value:
+            filters.append({"Name": f"tag:{key}", "Values": value.split("|")})
+        else:
+            filters.append({"Name": "tag-key", "Values": [key]})
+    return filters
+
+
+def select_instances(route_finder, filters) -> list:
+    # Tag values aren't kept in the inventory, so the selection asks EC2 and maps the IDs back
+    route_finders = getattr(route_finder, "route_finders", {None: route_finder}).values()
+    selected = []
+    for regional in route_finders:
+        for page in regional.paginate("describe_instances", Filters=RUNNING_INSTANCE_FILTERS + filters):
+            for reservation in page["Reservations"]:
+                selected.extend(route_finder.instance_map[i["InstanceId"]] for i in reservation["Instances"]
+                                if i["InstanceId"] in route_finder.instance_map)
+    return selected
+
+
+def equivalence_key(route_finder, endpoint: Endpoint) -> str:
+    # Route tables and network ACLs are associated per subnet, so the subnet stands in for both
+    enis = route_finder.get_enis_by_endpoint(endpoint)
+    if not enis:
+        return endpoint.id
+    return ";".join(sorted(f"{eni.SubnetId}|{'+'.join(sorted(eni.group_ids))}" for eni in enis))
+
+
+@dataclass
+class EquivalenceClass:
+    key: str
+    members: list = field(default_factory=list)
+
+
+@dataclass
+class ClassPairVerdict:
+    source_class: EquivalenceClass
+    destination_class: EquivalenceClass
+    representative: tuple
+    result: object = None
+    error: str = ""
+    samples: dict = field(default_factory=dict)
+
+    @property
+    def verified(self):
+        if not self.samples:
+            return None
+        return all(_verdict(r) == _verdict(self.result) for r in self.samples.values())
+
+
+def _pair_key(pair):
+    return pair[0].id, pair[1].id
+
+
+def _verdict(result):
+    if result is None or isinstance(result, Exception) or not result.is_succeed:
+        return None
+    return result.is_reachable
+
+
+class ReachabilityMatrix:
+    def __init__(self, route_finder, max_workers=DEFAULT_MATRIX_CONCURRENCY, verify_samples=0, seed=None):
+        self.route_finder = route_finder
+        self.max_workers = max_workers
+        self.verify_samples = verify_samples
+        self._random = random.Random(seed)
+        self.analyses = 0
+        self.mismatches = 0
+
+    def classify(self, endpoints) -> list:
+        classes = {}
+        for endpoint in {e.id: e for e in endpoints}.values():
+            key = equivalence_key(self.route_finder, endpoint)
+            classes.setdefault(key, EquivalenceClass(key=key)).members.append(endpoint)
+        return list(classes.values())
+
+    def sample_pairs(self, source_class, destination_class, count, exclude=()) -> list:
+        pairs = {}
+        for _ in range(count * 4):
+            if len(pairs) >= count:
+                break
+            pair = (self._random.choice(source_class.members), self._random.choice(destination_class.members))
+            key = _pair_key(pair)
+            if pair[0].id != pair[1].id and key not in exclude:
+                pairs[key] = pair
+        return list(pairs.values())
+
+    def first_pair(self, source_class, destination_class):
+        for source, destination in itertools.product(source_class.members, destination_class.members):
+            if source.id != destination.id:
+                return source, destination
+        return None
+
+    def analyze(self, source, destination, protocol, destination_port):
+        with scheduling_priority(BATCH):
+            return self.route_finder.run(source=source, destination=destination, protocol=protocol,
+                                         destination_port=destination_port, show_progress=False)
+
+    def evaluate(self, verdict: ClassPairVerdict, protocol, destination_port) -> ClassPairVerdict:
+        try:
+            verdict.result = self.analyze(*verdict.representative, protocol, destination_port)
+        except Exception as e:
+            verdict.error = f"{type(e).__name__}: {e}"
+            return verdict
+        samples = self.sample_pairs(verdict.source_class, verdict.destination_class, self.verify_samples,
+                                    exclude={_pair_key(verdict.representative)}) if self.verify_samples else []
+        for pair in samples:
+            try:
+                verdict.samples[_pair_key(pair)] = self.analyze(*pair, protocol, destination_port)
+            except Exception as e:
+                verdict.samples[_pair_key(pair)] = e
+        return verdict
+
+    def record(self, verdict: ClassPairVerdict, pair, result, protocol, destination_port, representative) -> dict:
+        record = {
+            "source": pair[0].id, "destination": pair[1].id,
+            "source_class": verdict.source_class.key, "destination_class": verdict.destination_class.key,
+            "protocol": protocol, "destination_port": destination_port,
+            "representative": representative, "verified": verdict.verified,
+        }
+        if isinstance(result, Exception):
+            record["error"] = f"{type(result).__name__}: {result}"
+        elif result is None:
+            record["error"] = verdict.error
+        else:
+            record.update({
+                "status": result.status,
+                "is_reachable": None if result.is_running else result.is_reachable,
+                "explanation_codes": result.explanation_codes,
+                "network_insight_analysis_id": result.network_insight_analysis_id,
+            })
+        return record
+
+    def run(self, sources, destinations, protocol="tcp", destination_port=80):
+        source_classes, destination_classes = self.classify(sources), self.classify(destinations)
+        verdicts = []
+        for source_class, destination_class in itertools.product(source_classes, destination_classes):
+            representative = self.first_pair(source_class, destination_class)
+            if representative is not None:
+                verdicts.append(ClassPairVerdict(source_class=source_class, destination_class=destination_class,
+                                                 representative=representative))
+
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        try:
+            futures = [executor.submit(self.evaluate, verdict, protocol, destination_port) for verdict in verdicts]
+            for future in as_completed(futures):
+                verdict = future.result()
+                self.analyses += 1 + len(verdict.samples)
+                self.mismatches += sum(_verdict(r) != _verdict(verdict.result) for r in verdict.samples.values())
+                yield from self.project(verdict, protocol, destination_port)
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def project(self, verdict: ClassPairVerdict, protocol, destination_port):
+        for pair in itertools.product(verdict.source_class.members, verdict.destination_class.members):
+            key = _pair_key(pair)
+            if pair[0].id == pair[1].id:
+                continue
+            if key == _pair_key(verdict.representative):
+                yield self.record(verdict, pair, verdict.result, protocol, destination_port, representative=True)
+            elif key in verdict.samples:
+                yield self.record(verdict, pair, verdict.samples[key], protocol, destination_port,
+                                  representative=True)
+            else:
+                yield self.record(verdict, pair, verdict.result, protocol, destination_port, representative=False)
@@ -0,0 +1,188 @@
+import time
+import threading
+from collections import defaultdict
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+
+from routefinder.dto import RouteFindingResult
+from routefinder.instrumentation import THROTTLE_ERROR_CODES
+from routefinder.polling import LatencyHistogram, PollingStrategy
+
+
+@dataclass
+class PendingAnalysis:
+    network_insight_path_id: str
+    future: Future
+    submitted_at: float
+    next_poll_at: float
+    attempt: int = 0
+    detail: dict = field(default_factory=dict)
+    resumed: bool = False
+
+
+NOT_FOUND_ERROR_CODES = frozenset(["InvalidNetworkInsightsAnalysisId.NotFound",
+                                   "InvalidNetworkInsightsAnalysisId.Malformed"])
+
+
+def _error_code(exc):
+    return getattr(exc, "response", {}).get("Error", {}).get("Code")
+
+
+def is_transient_error(exc) -> bool:
+    from botocore.exceptions import ConnectionError, HTTPClientError
+
+    if isinstance(exc, (ConnectionError, HTTPClientError)):
+        return True
+    status_code = getattr(exc, "response", {}).get("ResponseMetadata", {}).get("HTTPStatusCode") or 0
+    return _error_code(exc) in THROTTLE_ERROR_CODES or status_code >= 500
+
+
+class AnalysisPoller:
+    MAX_BATCH_SIZE = 100
+
+    def __init__(self, ec2_client, strategy: PollingStrategy = None):
+        self._proxy = ec2_client
+        self.strategy = strategy or PollingStrategy()
+        self.histograms = defaultdict(LatencyHistogram)
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    @property
+    def pending_count(self):
+        with self._lock:
+            return len(self._pending)
+
+    def expected_duration(self):
+        return self.strategy.expected_duration(self.histograms.get("succeeded"))
+
+    def submit(self, network_insight_analysis_id, network_insight_path_id, resumed=False) -> Future:
+        # A resumed analysis was started by an earlier run: it's polled at once and kept out of the latency histograms
+        future = Future()
+        now = time.monotonic()
+        with self._lock:
+            first_delay = 0 if resumed else self.strategy.first_delay(self.histograms.get("succeeded"))
+            self._pending[network_insight_analysis_id] = PendingAnalysis(
+                network_insight_path_id=network_insight_path_id, future=future,
+                submitted_at=now, next_poll_at=now + first_delay, resumed=resumed)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="routefinder-poller", daemon=True)
+                self._thread.start()
+        self._wakeup.set()
+        return future
+
+    def poll(self):
+        now = time.monotonic()
+        # Analyses that are due shortly ride along with the ones that are due now
+        horizon = now + self.strategy.min_delay / 2
+        with self._lock:
+            expired = {k for k, v in self._pending.items() if self.strategy.is_expired(now - v.submitted_at)}
+            analysis_ids = [k for k, v in self._pending.items() if v.next_poll_at <= horizon and k not in expired]
+
+        for analysis_id in expired:
+            self._expire(analysis_id)
+
+        for i in range(0, len(analysis_ids), self.MAX_BATCH_SIZE):
+            self.poll_chunk(analysis_ids[i:i + self.MAX_BATCH_SIZE])
+
+    def poll_chunk(self, chunk):
+        try:
+            analyses = list(self.describe(chunk))
+        except Exception as e:
+            if _error_code(e) in NOT_FOUND_ERROR_CODES and len(chunk) > 1:
+                # One unknown ID rejects the whole request; bisect so only that analysis fails
+                middle = len(chunk) // 2
+                self.poll_chunk(chunk[:middle])
+                self.poll_chunk(chunk[middle:])
+            elif is_transient_error(e):
+                # Throttling or a network error outlasted botocore's retries; try again later
+                for analysis_id in chunk:
+                    self._reschedule(analysis_id)
+            else:
+                self._fail(chunk, e)
+            return
+
+        for analysis in analyses:
+            if analysis["Status"] != "running":
+                self._resolve(analysis)
+            else:
+                self._reschedule(analysis["NetworkInsightsAnalysisId"], analysis)
+
+        # Freshly started analyses may not be visible yet
+        described = {analysis["NetworkInsightsAnalysisId"] for analysis in analyses}
+        for analysis_id in set(chunk).difference(described):
+            self._reschedule(analysis_id)
+
+    def describe(self, analysis_ids):
+        paginator = self._proxy.get_paginator("describe_network_insights_analyses")
+        for page in paginator.paginate(NetworkInsightsAnalysisIds=analysis_ids):
+            yield from page["NetworkInsightsAnalyses"]
+
+    def _reschedule(self, network_insight_analysis_id, analysis=None):
+        with self._lock:
+            entry = self._pending.get(network_insight_analysis_id)
+            if entry is None:
+                return
+            if analysis:
+                entry.detail = analysis
+            entry.attempt += 1
+            entry.next_poll_at = time.monotonic() + self.strategy.next_delay(entry.attempt)
+
+    def _complete(self, network_insight_analysis_id, detail, timed_out=False):
+        with self._lock:
+            entry = self._pending.pop(network_insight_analysis_id, None)
+            if entry is None:
+                return
+            elapsed = time.monotonic() - entry.submitted_at
+            status = "timed-out" if timed_out else detail["Status"]
+            if not entry.resumed:
+                self.histograms[status].record(elapsed)
+
+        entry.future.set_result(RouteFindingResult(
+            network_insight_path_id=entry.network_insight_path_id,
+            network_insight_analysis_id=network_insight_analysis_id,
+            region_name=self._proxy.meta.region_name,
+            detail={"NetworkInsightsAnalyses": [detail]},
+            timed_out=timed_out,
+            elapsed=elapsed
+        ))
+
+    def _resolve(self, analysis):
+        self._complete(analysis["NetworkInsightsAnalysisId"], analysis)
+
+    def _expire(self, network_insight_analysis_id):
+        with self._lock:
+            entry = self._pending.get(network_insight_analysis_id)
+            detail = entry.detail if entry else {}
+        detail = detail or {"NetworkInsightsAnalysisId": network_insight_analysis_id, "Status": "running"}
+        self._complete(network_insight_analysis_id, detail, timed_out=True)
+
+    def _fail(self, analysis_ids, exc):
+        with self._lock:
+            entries = [self._pending.pop(i, None) for i in analysis_ids]
+        for entry in entries:
+            if entry is not None:
+                entry.future.set_exception(exc)
+
+    def _next_wakeup(self):
+        with self._lock:
+            if not self._pending:
+                self._thread = None
+                return None
+            next_poll_at = min(v.next_poll_at for v in self._pending.values())
+            if self.strategy.deadline is not None:
+                next_deadline = min(v.submitted_at for v in self._pending.values()) + self.strategy.deadline
+                next_poll_at = min(next_poll_at, next_deadline)
+            return next_poll_at
+
+    def _run(self):
+        while True:
+            self._wakeup.clear()
+            next_poll_at = self._next_wakeup()
+            if next_poll_at is None:
+                return
+            timeout = next_poll_at - time.monotonic()
+            if timeout > 0 and self._wakeup.wait(timeout):
+                continue
+            self.poll()
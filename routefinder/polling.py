@@ -0,0 +1,76 @@
+import bisect
+import random
+from collections import deque
+from dataclasses import dataclass
+
+LATENCY_BUCKETS = (1, 2, 5, 10, 20, 30, 45, 60, 90, 120, 300, 600)
+
+
+class LatencyHistogram:
+    def __init__(self, buckets=LATENCY_BUCKETS, max_samples=1024):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self._samples = deque(maxlen=max_samples)
+
+    def record(self, seconds: float):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self._samples.append(seconds)
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def quantile(self, q: float):
+        if not self._samples:
+            return None
+        samples = sorted(self._samples)
+        return samples[min(int(q * len(samples)), len(samples) - 1)]
+
+    def to_dict(self):
+        labels = [f"<={b}s" for b in self.buckets] + [f">{self.buckets[-1]}s"]
+        return {
+            "count": self.count,
+            "mean": round(self.mean, 3),
+            "p50": self.quantile(0.5),
+            "p90": self.quantile(0.9),
+            "buckets": dict(zip(labels, self.counts)),
+        }
+
+
+@dataclass
+class PollingStrategy:
+    initial_delay: float = 10.0
+    min_delay: float = 1.0
+    max_delay: float = 15.0
+    backoff: float = 1.5
+    jitter: float = 0.2
+    deadline: float = 600.0
+    min_samples: int = 5
+
+    def first_delay(self, histogram: LatencyHistogram = None) -> float:
+        delay = self.initial_delay
+        if histogram is not None and histogram.count >= self.min_samples:
+            # Most analyses finish after the fastest quarter, so there is no point asking earlier
+            delay = histogram.quantile(0.25)
+        return self._jittered(max(self.min_delay, delay))
+
+    def next_delay(self, attempt: int) -> float:
+        delay = min(self.max_delay, self.min_delay * self.backoff ** attempt)
+        return self._jittered(delay)
+
+    def expected_duration(self, histogram: LatencyHistogram = None) -> float:
+        if histogram is not None and histogram.count >= self.min_samples:
+            return histogram.quantile(0.5)
+        return self.initial_delay * 2
+
+    def is_expired(self, elapsed: float) -> bool:
+        return self.deadline is not None and elapsed >= self.deadline
+
+    def _jittered(self, delay):
+        if not self.jitter:
+            return delay
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
@@ -0,0 +1,66 @@
+import socket
+import threading
+import ipaddress
+
+IPV4_MASKS = [(0xFFFFFFFF << (32 - prefix_len)) & 0xFFFFFFFF for prefix_len in range(33)]
+
+
+class PrefixIndex:
+    # One hash table per prefix length; a lookup probes at most 33 tables, longest prefix first.
+    # The tables and their prefix lengths are replaced together, so a lookup running during clear()
+    # never probes a length whose table is gone.
+    def __init__(self, items=()):
+        self._state = ({}, [])
+        self._lock = threading.Lock()
+        self.update(items)
+
+    def __len__(self):
+        return sum(len(table) for table in self._state[0].values())
+
+    def __contains__(self, ip):
+        return self.lookup(ip) is not None
+
+    def insert(self, cidr, value):
+        if "/" in cidr:
+            network = ipaddress.ip_network(cidr, strict=False)
+            if network.version != 4:
+                return
+            prefix_len, address = network.prefixlen, int(network.network_address)
+        else:
+            try:
+                prefix_len, address = 32, int.from_bytes(socket.inet_pton(socket.AF_INET, cidr), "big")
+            except OSError:
+                return
+
+        table = self._state[0].get(prefix_len)
+        if table is None:
+            with self._lock:
+                tables = self._state[0]
+                table = tables.setdefault(prefix_len, {})
+                self._state = (tables, sorted(tables, reverse=True))
+        table[address] = value
+
+    def update(self, items):
+        for cidr, value in items:
+            self.insert(cidr, value)
+
+    def lookup(self, ip):
+        for _, value in self.iter_matches(ip):
+            return value
+        return None
+
+    def iter_matches(self, ip):
+        try:
+            address = int.from_bytes(socket.inet_pton(socket.AF_INET, ip), "big")
+        except (OSError, TypeError):
+            return
+
+        tables, prefix_lengths = self._state
+        for prefix_len in prefix_lengths:
+            value = tables[prefix_len].get(address & IPV4_MASKS[prefix_len])
+            if value is not None:
+                yield prefix_len, value
+
+    def clear(self):
+        with self._lock:
+            self._state = ({}, [])
@@ -0,0 +1,191 @@
+import functools
+import ipaddress
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+
+from routefinder.dto import Endpoint, NetworkInterface, RouteFindingResult
+from routefinder.scheduler import BACKGROUND, with_priority
+
+PROTOCOL_NUMBERS = {"tcp": "6", "udp": "17", "icmp": "1"}
+
+ALLOWED, BLOCKED, UNKNOWN = "allowed", "blocked", "unknown"
+
+# ENIs managed by these services don't enforce security groups
+SG_EXEMPT_INTERFACE_TYPES = frozenset(["nat_gateway", "transit_gateway", "gateway_load_balancer",
+                                       "gateway_load_balancer_endpoint"])
+
+
+@functools.lru_cache(maxsize=65536)
+def _network(cidr):
+    return ipaddress.ip_network(cidr, strict=False)
+
+
+def _in_cidr(ip, cidr):
+    try:
+        return ipaddress.ip_address(ip) in _network(cidr)
+    except ValueError:
+        return False
+
+
+def _protocol_matches(rule_protocol, protocol):
+    rule_protocol = str(rule_protocol)
+    return rule_protocol == "-1" or rule_protocol in (protocol, PROTOCOL_NUMBERS.get(protocol))
+
+
+def _port_matches(port_range, port):
+    if not port_range or port is None:
+        return True
+    return port_range.get("From", port_range.get("FromPort", 0)) <= port <= \
+        port_range.get("To", port_range.get("ToPort", 65535))
+
+
+@dataclass
+class PreflightVerdict:
+    blocked: bool
+    explanation_code: str = ""
+    component_id: str = ""
+    direction: str = ""
+
+    def to_result(self, region_name="") -> RouteFindingResult:
+        explanation = {"ExplanationCode": self.explanation_code, "Component": {"Id": self.component_id}}
+        if self.direction:
+            explanation["Direction"] = self.direction
+        return RouteFindingResult(
+            network_insight_path_id="",
+            network_insight_analysis_id="",
+            region_name=region_name,
+            detail={"NetworkInsightsAnalyses": [{
+                "Status": "succeeded", "NetworkPathFound": False, "Explanations": [explanation]}]},
+            predicted=True
+        )
+
+
+class PreflightEvaluator:
+    # Predicts only blocks it is sure about; anything it can't evaluate locally
+    # (prefix lists, security group references, IPv6, ...) is left to Reachability Analyzer.
+    def __init__(self, ec2_client):
+        self._proxy = ec2_client
+        self.route_tables = {}
+        self.main_route_tables = {}
+        self.security_groups = {}
+        self.network_acls = {}
+
+    def _describe(self, operation_name, key):
+        paginator = self._proxy.get_paginator(operation_name)
+        for page in paginator.paginate():
+            yield from page[key]
+
+    def load(self):
+        loaders = [self.load_route_tables, self.load_security_groups, self.load_network_acls]
+        with ThreadPoolExecutor(max_workers=len(loaders)) as executor:
+            for future in [executor.submit(with_priority, BACKGROUND, loader) for loader in loaders]:
+                future.result()
+        return self
+
+    def load_route_tables(self):
+        for rtb in self._describe("describe_route_tables", "RouteTables"):
+            for association in rtb.get("Associations", []):
+                if association.get("Main"):
+                    self.main_route_tables[rtb["VpcId"]] = rtb
+                elif association.get("SubnetId"):
+                    self.route_tables[association["SubnetId"]] = rtb
+
+    def load_security_groups(self):
+        for sg in self._describe("describe_security_groups", "SecurityGroups"):
+            self.security_groups[sg["GroupId"]] = sg
+
+    def load_network_acls(self):
+        for acl in self._describe("describe_network_acls", "NetworkAcls"):
+            for association in acl.get("Associations", []):
+                self.network_acls[association["SubnetId"]] = acl
+
+    def route_table_for(self, eni: NetworkInterface):
+        return self.route_tables.get(eni.SubnetId) or self.main_route_tables.get(eni.VpcId)
+
+    def check_route(self, eni: NetworkInterface, destination_ip):
+        rtb = self.route_table_for(eni)
+        if rtb is None:
+            return UNKNOWN, ""
+        routes = rtb.get("Routes", [])
+        matched = [r for r in routes if _in_cidr(destination_ip, r.get("DestinationCidrBlock", ""))]
+        if matched:
+            route = max(matched, key=lambda r: _network(r["DestinationCidrBlock"]).prefixlen)
+            return UNKNOWN if route.get("State") == "blackhole" else ALLOWED, rtb["RouteTableId"]
+        if any("DestinationPrefixListId" in r for r in routes):
+            return UNKNOWN, rtb["RouteTableId"]
+        return BLOCKED, rtb["RouteTableId"]
+
+    def check_security_groups(self, eni: NetworkInterface, peer_ip, protocol, port, egress, peer_groups=()):
+        if eni.InterfaceType in SG_EXEMPT_INTERFACE_TYPES or not eni.group_ids:
+            return UNKNOWN, ""
+        verdict = BLOCKED
+        for group_id in eni.group_ids:
+            sg = self.security_groups.get(group_id)
+            if sg is None:
+                return UNKNOWN, group_id
+            for rule in sg["IpPermissionsEgress" if egress else "IpPermissions"]:
+                if not _protocol_matches(rule["IpProtocol"], protocol):
+                    continue
+                if rule["IpProtocol"] != "-1" and not _port_matches(rule, port):
+                    continue
+                if any(_in_cidr(peer_ip, r["CidrIp"]) for r in rule.get("IpRanges", [])):
+                    return ALLOWED, group_id
+                if any(pair.get("GroupId") in peer_groups for pair in rule.get("UserIdGroupPairs", [])):
+                    return ALLOWED, group_id
+                if rule.get("UserIdGroupPairs") or rule.get("PrefixListIds"):
+                    verdict = UNKNOWN
+        return verdict, ",".join(eni.group_ids)
+
+    def check_network_acl(self, eni: NetworkInterface, peer_ip, protocol, port, egress):
+        acl = self.network_acls.get(eni.SubnetId)
+        if acl is None:
+            return UNKNOWN, ""
+        entries = sorted((e for e in acl["Entries"] if e["Egress"] == egress and "CidrBlock" in e),
+                         key=lambda e: e["RuleNumber"])
+        for entry in entries:
+            if not _protocol_matches(entry["Protocol"], protocol):
+                continue
+            if entry["Protocol"] != "-1" and not _port_matches(entry.get("PortRange"), port):
+                continue
+            if _in_cidr(peer_ip, entry["CidrBlock"]):
+                return ALLOWED if entry["RuleAction"] == "allow" else BLOCKED, acl["NetworkAclId"]
+        return BLOCKED, acl["NetworkAclId"]
+
+    def evaluate(self, route_finder, source: Endpoint, destination: Endpoint = None, protocol="tcp",
+                 destination_ip=None, destination_port=None) -> PreflightVerdict:
+        source_enis = route_finder.get_enis_by_endpoint(source)
+        destination_enis = route_finder.get_enis_by_endpoint(destination) if destination is not None else []
+        if len(source_enis) != 1 or len(destination_enis) > 1:
+            return PreflightVerdict(blocked=False)
+
+        source_eni = source_enis[0]
+        destination_eni = destination_enis[0] if destination_enis else None
+        if destination_eni is not None:
+            destination_ip = destination_eni.PrivateIpAddress
+        if not destination_ip:
+            return PreflightVerdict(blocked=False)
+
+        checks = [
+            (lambda: self.check_route(source_eni, destination_ip), "NO_ROUTE_TO_DESTINATION", ""),
+            (lambda: self.check_security_groups(source_eni, destination_ip, protocol, destination_port, egress=True),
+             "ENI_SG_RULES_MISMATCH", "egress"),
+        ]
+        same_subnet = destination_eni is not None and destination_eni.SubnetId == source_eni.SubnetId
+        if not same_subnet:
+            checks.append((lambda: self.check_network_acl(source_eni, destination_ip, protocol, destination_port,
+                                                          egress=True), "SUBNET_ACL_RESTRICTION", "egress"))
+        if destination_eni is not None:
+            source_ip = source_eni.PrivateIpAddress
+            if not same_subnet:
+                checks.append((lambda: self.check_network_acl(destination_eni, source_ip, protocol, destination_port,
+                                                              egress=False), "SUBNET_ACL_RESTRICTION", "ingress"))
+            checks.append((lambda: self.check_security_groups(destination_eni, source_ip, protocol, destination_port,
+                                                              egress=False, peer_groups=source_eni.group_ids),
+                           "ENI_SG_RULES_MISMATCH", "ingress"))
+
+        for check, explanation_code, direction in checks:
+            verdict, component_id = check()
+            if verdict == BLOCKED:
+                return PreflightVerdict(blocked=True, explanation_code=explanation_code,
+                                        component_id=component_id, direction=direction)
+        return PreflightVerdict(blocked=False)
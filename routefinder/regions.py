@@ -0,0 +1,94 @@
+from routefinder.app import RouteFinder
+from routefinder.dto import Endpoint, NetworkInterface
+from routefinder.resolver import DnsResolver
+
+
+def list_enabled_regions(ec2_client) -> list:
+    response = ec2_client.describe_regions(
+        Filters=[{"Name": "opt-in-status", "Values": ["opt-in-not-required", "opted-in"]}])
+    return sorted(r["RegionName"] for r in response["Regions"])
+
+
+class MultiRegionRouteFinder:
+    # Merged, region-tagged view over one RouteFinder per region.
+    # Private IPs that overlap between regions resolve to the first region in sorted order.
+    MAP_NAMES = ("instance_map", "igw_map", "eni_map", "ip_map", "subnet_map", "vpc_map")
+
+    def __init__(self, route_finders: dict, resolver: DnsResolver = None):
+        self.route_finders = dict(sorted(route_finders.items()))
+        self.resolver = resolver or DnsResolver()
+        self.region_map = {}
+        for name in self.MAP_NAMES:
+            setattr(self, name, {})
+        self.endpoint_map = {
+            "EC2": self.instance_map,
+            "IGW": self.igw_map,
+            "ENI": self.eni_map,
+            "IP": self.ip_map,
+            "SUBNET": self.subnet_map,
+            "VPC": self.vpc_map
+        }
+        for region_name, route_finder in reversed(self.route_finders.items()):
+            route_finder.resolver = self.resolver
+            for name in self.MAP_NAMES:
+                regional_map = getattr(route_finder, name)
+                getattr(self, name).update(regional_map)
+                self.region_map.update(dict.fromkeys(regional_map, region_name))
+
+    @property
+    def regions(self):
+        return list(self.route_finders)
+
+    @property
+    def igws(self):
+        return list(self.igw_map.values())
+
+    @property
+    def instances(self):
+        return list(self.instance_map.values())
+
+    def region_of(self, endpoint: Endpoint) -> str:
+        return self.region_map[endpoint.id]
+
+    def route_finder_of(self, endpoint: Endpoint) -> RouteFinder:
+        return self.route_finders[self.region_of(endpoint)]
+
+    def get_label(self, endpoint: Endpoint) -> str:
+        return f"[{self.region_of(endpoint)}] {endpoint!r}"
+
+    def resolve_ip(self, ip) -> Endpoint:
+        best_prefix_len, best_owner = -1, None
+        for route_finder in self.route_finders.values():
+            for prefix_len, owner in route_finder.prefix_index.iter_matches(ip):
+                if prefix_len > best_prefix_len:
+                    best_prefix_len, best_owner = prefix_len, owner
+                break
+        return best_owner
+
+    def get_host_by_name(self, fqdn: str):
+        return self.resolver.resolve(fqdn)
+
+    def get_hosts_by_name(self, fqdn: str) -> list:
+        return self.resolver.resolve_all(fqdn)
+
+    def pick_address(self, addresses) -> (str, Endpoint):
+        return RouteFinder.pick_address(self, addresses)
+
+    def resolve_name(self, fqdn: str) -> (str, Endpoint):
+        return self.pick_address(self.get_hosts_by_name(fqdn))
+
+    def get_eni_by_ip(self, ip):
+        return RouteFinder.get_eni_by_ip(self, ip)
+
+    def get_enis_by_name(self, fqdn) -> list:
+        return RouteFinder.get_enis_by_name(self, fqdn)
+
+    def get_enis_by_endpoint(self, endpoint: Endpoint) -> list:
+        if isinstance(endpoint, NetworkInterface):
+            return [endpoint]
+        return self.route_finder_of(endpoint).get_enis_by_endpoint(endpoint)
+
+    def run(self, source: Endpoint, destination: Endpoint = None, **kwargs):
+        if isinstance(destination, Endpoint) and self.region_of(destination) != self.region_of(source):
+            raise ValueError("Source and Destination must be in the same region")
+        return self.route_finder_of(source).run(source=source, destination=destination, **kwargs)
@@ -0,0 +1,69 @@
+import json
+import threading
+from concurrent.futures import Future
+
+PATH_DEFINITION_KEYS = ("Source", "Destination", "SourceIp", "DestinationIp", "Protocol", "DestinationPort",
+                        "FilterAtSource", "FilterAtDestination")
+
+
+def _prune(value):
+    if isinstance(value, dict):
+        pruned = {k: _prune(v) for k, v in value.items()}
+        return {k: v for k, v in pruned.items() if v not in (None, "", {}, [])}
+    return value
+
+
+def canonicalize_path(definition: dict) -> str:
+    return json.dumps(_prune({k: definition.get(k) for k in PATH_DEFINITION_KEYS}),
+                      sort_keys=True, separators=(",", ":"))
+
+
+class PathRegistry:
+    def __init__(self, ec2_client):
+        self._proxy = ec2_client
+        self._paths = {}
+        self._lock = threading.Lock()
+        self._seeded = False
+
+    def __len__(self):
+        return len(self._paths)
+
+    def seed(self):
+        paginator = self._proxy.get_paginator("describe_network_insights_paths")
+        for page in paginator.paginate():
+            for path in page["NetworkInsightsPaths"]:
+                future = Future()
+                future.set_result(path["NetworkInsightsPathId"])
+                self._paths.setdefault(canonicalize_path(path), future)
+        self._seeded = True
+
+    def prime(self, paths: dict):
+        # Path IDs known from elsewhere (e.g. a journal) are reused as if they had been seeded
+        with self._lock:
+            for key, network_insight_path_id in paths.items():
+                future = Future()
+                future.set_result(network_insight_path_id)
+                self._paths.setdefault(key, future)
+
+    def get_or_create(self, **create_network_insights_path_kwargs) -> str:
+        key = canonicalize_path(create_network_insights_path_kwargs)
+        with self._lock:
+            if not self._seeded:
+                self.seed()
+            future = self._paths.get(key)
+            is_owner = future is None
+            if is_owner:
+                future = self._paths[key] = Future()
+
+        if is_owner:
+            try:
+                network_insight = self._proxy.create_network_insights_path(**create_network_insights_path_kwargs)
+                future.set_result(network_insight['NetworkInsightsPath']['NetworkInsightsPathId'])
+            except Exception as e:
+                self.forget(**create_network_insights_path_kwargs)
+                future.set_exception(e)
+        return future.result()
+
+    def forget(self, **create_network_insights_path_kwargs):
+        with self._lock:
+            self._paths.pop(canonicalize_path(create_network_insights_path_kwargs), None)
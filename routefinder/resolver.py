@@ -0,0 +1,90 @@
+import time
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_DNS_TTL = 60
+DEFAULT_NEGATIVE_DNS_TTL = 10
+
+
+def is_ipv4(name):
+    try:
+        socket.inet_pton(socket.AF_INET, name)
+        return True
+    except (OSError, TypeError):
+        return False
+
+
+def addresses_from_addrinfo(addrinfo):
+    addresses = []
+    for *_, sockaddr in addrinfo:
+        if sockaddr[0] not in addresses:
+            addresses.append(sockaddr[0])
+    return addresses
+
+
+class DnsResolver:
+    def __init__(self, ttl=DEFAULT_DNS_TTL, negative_ttl=DEFAULT_NEGATIVE_DNS_TTL, max_workers=16):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_workers = max_workers
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def get_cached(self, name):
+        with self._lock:
+            entry = self._cache.get(name)
+        if entry is None or entry[0] < time.monotonic():
+            return None
+        expires_at, addresses, error = entry
+        if error is not None:
+            # A fresh instance per hit: re-raising the stored one would keep growing its traceback
+            error_type, error_args = error
+            raise error_type(*error_args)
+        return list(addresses)
+
+    def store(self, name, result):
+        if isinstance(result, Exception):
+            entry = (time.monotonic() + self.negative_ttl, (), (type(result), result.args))
+        else:
+            entry = (time.monotonic() + self.ttl, tuple(result), None)
+        with self._lock:
+            self._cache[name] = entry
+
+    def resolve_all(self, name) -> list:
+        if is_ipv4(name):
+            return [name]
+        cached = self.get_cached(name)
+        if cached is not None:
+            return cached
+
+        try:
+            addresses = addresses_from_addrinfo(
+                socket.getaddrinfo(name, None, family=socket.AF_INET, type=socket.SOCK_STREAM))
+        except socket.gaierror as e:
+            self.store(name, e)
+            raise
+        self.store(name, addresses)
+        return addresses
+
+    def resolve(self, name) -> str:
+        return self.resolve_all(name)[0]
+
+    def resolve_many(self, names) -> dict:
+        names = list(dict.fromkeys(names))
+        results = {}
+
+        def _resolve(name):
+            try:
+                return self.resolve_all(name)
+            except socket.gaierror as e:
+                return e
+
+        with ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(names)))) as executor:
+            for name, result in zip(names, executor.map(_resolve, names)):
+                results[name] = result
+        return results
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
@@ -0,0 +1,110 @@
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+from routefinder.dto import RouteFindingResult
+from routefinder.registry import canonicalize_path
+
+DEFAULT_RESULT_TTL = 24 * 3600
+DEFAULT_RESULT_CACHE_SIZE = 10000
+
+
+class NetworkFingerprint:
+    def __init__(self, ec2_client):
+        self._proxy = ec2_client
+
+    def _describe(self, operation_name, key, **kwargs):
+        paginator = self._proxy.get_paginator(operation_name)
+        rows = []
+        for page in paginator.paginate(**kwargs):
+            rows.extend(page[key])
+        return rows
+
+    def compute(self, eni_ids, vpc_ids, extra=None) -> str:
+        eni_ids, vpc_ids = sorted(set(eni_ids)), sorted(set(vpc_ids))
+        enis = self._describe("describe_network_interfaces", "NetworkInterfaces",
+                              NetworkInterfaceIds=eni_ids) if eni_ids else []
+        group_ids = sorted({g["GroupId"] for eni in enis for g in eni.get("Groups", [])})
+        vpc_filter = [{"Name": "vpc-id", "Values": vpc_ids}]
+
+        state = {
+            "extra": extra,
+            "enis": [{k: eni.get(k) for k in ("NetworkInterfaceId", "SubnetId", "Groups", "PrivateIpAddresses",
+                                               "Association", "SourceDestCheck", "Status")} for eni in enis],
+            "security_groups": [
+                {k: sg.get(k) for k in ("GroupId", "IpPermissions", "IpPermissionsEgress")}
+                for sg in self._describe("describe_security_groups", "SecurityGroups", GroupIds=group_ids)
+            ] if group_ids else [],
+            "route_tables": [
+                {k: rtb.get(k) for k in ("RouteTableId", "Routes", "Associations")}
+                for rtb in self._describe("describe_route_tables", "RouteTables", Filters=vpc_filter)
+            ] if vpc_ids else [],
+            "network_acls": [
+                {k: acl.get(k) for k in ("NetworkAclId", "Entries", "Associations")}
+                for acl in self._describe("describe_network_acls", "NetworkAcls", Filters=vpc_filter)
+            ] if vpc_ids else [],
+        }
+        payload = json.dumps(state, sort_keys=True, default=str, separators=(",", ":"))
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class ResultCache:
+    def __init__(self, path, ttl=DEFAULT_RESULT_TTL, max_entries=DEFAULT_RESULT_CACHE_SIZE):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " path_key TEXT PRIMARY KEY, fingerprint TEXT NOT NULL,"
+            " created_at REAL NOT NULL, accessed_at REAL NOT NULL, payload TEXT NOT NULL)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS results_accessed_at ON results (accessed_at)")
+        self._conn.commit()
+
+    def get(self, create_network_insights_path_kwargs: dict, fingerprint: str) -> RouteFindingResult:
+        path_key = canonicalize_path(create_network_insights_path_kwargs)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT fingerprint, created_at, payload FROM results WHERE path_key = ?", (path_key,)).fetchone()
+            if row is None:
+                return None
+            if row[0] != fingerprint or now - row[1] >= self.ttl:
+                self._conn.execute("DELETE FROM results WHERE path_key = ?", (path_key,))
+                self._conn.commit()
+                return None
+            self._conn.execute("UPDATE results SET accessed_at = ? WHERE path_key = ?", (now, path_key))
+            self._conn.commit()
+
+        payload = json.loads(row[2])
+        return RouteFindingResult(cached=True, **payload)
+
+    def put(self, create_network_insights_path_kwargs: dict, fingerprint: str, result: RouteFindingResult):
+        path_key = canonicalize_path(create_network_insights_path_kwargs)
+        payload = json.dumps({
+            "network_insight_path_id": result.network_insight_path_id,
+            "network_insight_analysis_id": result.network_insight_analysis_id,
+            "region_name": result.region_name,
+            "detail": result.detail,
+            "elapsed": result.elapsed,
+        }, default=str)
+        now = time.time()
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)",
+                               (path_key, fingerprint, now, now, payload))
+            self.evict(now)
+            self._conn.commit()
+
+    def evict(self, now=None):
+        now = now or time.time()
+        self._conn.execute("DELETE FROM results WHERE created_at <= ?", (now - self.ttl,))
+        self._conn.execute(
+            "DELETE FROM results WHERE path_key IN ("
+            " SELECT path_key FROM results ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)", (self.max_entries,))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
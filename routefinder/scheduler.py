@@ -0,0 +1,179 @@
+import time
+import heapq
+import itertools
+import threading
+import functools
+import contextvars
+from contextlib import contextmanager
+
+from routefinder.instrumentation import THROTTLE_ERROR_CODES
+
+INTERACTIVE, BATCH, BACKGROUND = 0, 1, 2
+
+# (refill per second, burst) per API; mutating Network Insights calls have much smaller limits than Describe*
+DEFAULT_API_RATES = {
+    "create_network_insights_path": (2.0, 10),
+    "start_network_insights_analysis": (2.0, 10),
+    "delete_network_insights_path": (2.0, 10),
+    "delete_network_insights_analysis": (2.0, 10),
+}
+DEFAULT_DESCRIBE_RATE = (20.0, 100)
+DEFAULT_OTHER_RATE = (5.0, 20)
+THROTTLE_BACKOFF = 0.5
+MIN_RATE_FRACTION = 0.05
+RECOVERY_FRACTION = 0.05
+PASSTHROUGH_ATTRIBUTES = frozenset(["meta", "exceptions", "can_paginate", "get_waiter", "close"])
+
+_priority = contextvars.ContextVar("routefinder_api_priority", default=INTERACTIVE)
+
+
+@contextmanager
+def scheduling_priority(priority):
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def with_priority(priority, func, *args, **kwargs):
+    # Executor threads don't inherit the caller's context, so work submitted to them is wrapped in this
+    with scheduling_priority(priority):
+        return func(*args, **kwargs)
+
+
+class TokenBucket:
+    # Waiters are served strictly by (priority, arrival); a throttled API halves its refill
+    # rate and then creeps back towards the configured rate on every success.
+    def __init__(self, rate, burst):
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self._updated = time.monotonic()
+        self._waiters = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, priority=INTERACTIVE):
+        entry = (priority, next(self._sequence))
+        with self._condition:
+            heapq.heappush(self._waiters, entry)
+            try:
+                while True:
+                    self._refill()
+                    if self._waiters[0] == entry and self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    timeout = (1 - self.tokens) / self.rate if self._waiters[0] == entry else None
+                    self._condition.wait(timeout)
+            finally:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+                self._condition.notify_all()
+
+    def throttled(self):
+        with self._condition:
+            self._refill()
+            self.rate = max(self.max_rate * MIN_RATE_FRACTION, self.rate * THROTTLE_BACKOFF)
+            self.tokens = min(self.tokens, 0.0)
+
+    def succeeded(self):
+        if self.rate < self.max_rate:
+            with self._condition:
+                self._refill()
+                self.rate = min(self.max_rate, self.rate + self.max_rate * RECOVERY_FRACTION)
+
+
+class ApiScheduler:
+    # EC2 limits each API per account and region, so one scheduler is shared by every worker of
+    # an account and keeps a bucket per (region, API).
+    def __init__(self, rates: dict = None, describe_rate=DEFAULT_DESCRIBE_RATE, other_rate=DEFAULT_OTHER_RATE):
+        self.rates = dict(DEFAULT_API_RATES, **(rates or {}))
+        self.describe_rate = describe_rate
+        self.other_rate = other_rate
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, operation_name, region_name=None) -> TokenBucket:
+        with self._lock:
+            bucket = self._buckets.get((region_name, operation_name))
+            if bucket is None:
+                default_rate = self.describe_rate if operation_name.startswith("describe_") else self.other_rate
+                bucket = self._buckets[(region_name, operation_name)] = TokenBucket(
+                    *self.rates.get(operation_name, default_rate))
+        return bucket
+
+    def acquire(self, operation_name, region_name=None) -> TokenBucket:
+        bucket = self.bucket(operation_name, region_name)
+        bucket.acquire(_priority.get())
+        return bucket
+
+    def wrap(self, client):
+        if isinstance(client, ScheduledClient):
+            return client
+        return ScheduledClient(client, self)
+
+    def attach(self, client):
+        events = getattr(client.meta, "events", None)
+        if events is None:
+            return
+        events.register("needs-retry", functools.partial(self._needs_retry, client.meta.region_name),
+                        unique_id=f"routefinder-scheduler-{id(self)}")
+
+    def _needs_retry(self, region_name, response=None, operation=None, **kwargs):
+        if response is None or operation is None:
+            return None
+        if response[1].get("Error", {}).get("Code") in THROTTLE_ERROR_CODES:
+            from botocore import xform_name
+
+            self.bucket(xform_name(operation.name), region_name).throttled()
+        return None
+
+
+class ScheduledPaginator:
+    def __init__(self, paginator, operation_name, region_name, scheduler: ApiScheduler):
+        self._paginator = paginator
+        self._operation_name = operation_name
+        self._region_name = region_name
+        self._scheduler = scheduler
+
+    def paginate(self, **kwargs):
+        pages = iter(self._paginator.paginate(**kwargs))
+        while True:
+            bucket = self._scheduler.acquire(self._operation_name, self._region_name)
+            try:
+                page = next(pages)
+            except StopIteration:
+                return
+            bucket.succeeded()
+            yield page
+
+
+class ScheduledClient:
+    # Drop-in proxy for a boto3 client: every API call and every page waits for a token first
+    def __init__(self, client, scheduler: ApiScheduler):
+        self._client = client
+        self._scheduler = scheduler
+        scheduler.attach(client)
+
+    def get_paginator(self, operation_name):
+        return ScheduledPaginator(self._client.get_paginator(operation_name), operation_name,
+                                  self._client.meta.region_name, self._scheduler)
+
+    def __getattr__(self, name):
+        attribute = getattr(self._client, name)
+        if name.startswith("_") or name in PASSTHROUGH_ATTRIBUTES or not callable(attribute):
+            return attribute
+
+        def call(*args, **kwargs):
+            bucket = self._scheduler.acquire(name, self._client.meta.region_name)
+            response = attribute(*args, **kwargs)
+            bucket.succeeded()
+            return response
+        return call
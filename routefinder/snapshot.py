@@ -0,0 +1,61 @@
+import os
+import time
+import pickle
+
+DEFAULT_SNAPSHOT_DIR = os.path.join(os.path.expanduser("~"), ".cache", "routefinder")
+DEFAULT_SNAPSHOT_TTL = 3600
+
+
+class InventorySnapshot:
+    VERSION = 3
+    MAP_NAMES = ("instance_map", "igw_map", "eni_map", "ip_map", "subnet_map", "vpc_map")
+
+    def __init__(self, account_id, region_name, ttl=DEFAULT_SNAPSHOT_TTL, directory=DEFAULT_SNAPSHOT_DIR):
+        self.account_id = account_id
+        self.region_name = region_name
+        self.ttl = ttl
+        self.directory = directory
+
+    @property
+    def path(self):
+        return os.path.join(self.directory, f"inventory-{self.account_id}-{self.region_name}.pickle")
+
+    @property
+    def is_fresh(self):
+        try:
+            age = time.time() - os.path.getmtime(self.path)
+        except OSError:
+            return False
+        return age < self.ttl
+
+    def restore(self, route_finder) -> bool:
+        if not self.is_fresh:
+            return False
+        try:
+            with open(self.path, "rb") as f:
+                payload = pickle.load(f)
+        except (OSError, EOFError, AttributeError, ImportError, pickle.PickleError):
+            return False
+        if payload.get("version") != self.VERSION:
+            return False
+
+        for name in self.MAP_NAMES:
+            getattr(route_finder, name).update(payload[name])
+        return True
+
+    def save(self, route_finder):
+        payload = {"version": self.VERSION, "created_at": time.time()}
+        for name in self.MAP_NAMES:
+            payload[name] = getattr(route_finder, name)
+
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
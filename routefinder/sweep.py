@@ -0,0 +1,178 @@
+from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from routefinder.dto import Endpoint, RouteFindingResult
+from routefinder.scheduler import BATCH, scheduling_priority
+
+DEFAULT_SWEEP_CONCURRENCY = 4
+DEFAULT_MAX_AMBIGUOUS_SPLITS = 3
+HEADER_KEYS = ("OutboundHeader", "InboundHeader")
+UNDETERMINED = "undetermined"
+
+
+def merge_ranges(ranges) -> list:
+    merged = []
+    for from_port, to_port in sorted(ranges):
+        if merged and from_port <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], to_port))
+        else:
+            merged.append((from_port, to_port))
+    return merged
+
+
+def intersect_ranges(left, right) -> list:
+    intersection = []
+    for a_from, a_to in left:
+        for b_from, b_to in right:
+            if max(a_from, b_from) <= min(a_to, b_to):
+                intersection.append((max(a_from, b_from), min(a_to, b_to)))
+    return merge_ranges(intersection)
+
+
+def subtract_ranges(whole, parts) -> list:
+    gaps, cursor = [], whole[0]
+    for from_port, to_port in merge_ranges(parts):
+        if from_port > cursor:
+            gaps.append((cursor, from_port - 1))
+        cursor = max(cursor, to_port + 1)
+    if cursor <= whole[1]:
+        gaps.append((cursor, whole[1]))
+    return gaps
+
+
+def header_port_ranges(result: RouteFindingResult, port_range) -> list:
+    # Ports that every header along the found path admits. Empty when the headers carry no
+    # port information, or disagree with the query (e.g. a load balancer remapped the port).
+    ranges = [port_range]
+    seen = False
+    for component in result.detail["NetworkInsightsAnalyses"][0].get("ForwardPathComponents", []):
+        for key in HEADER_KEYS:
+            header_ranges = component.get(key, {}).get("DestinationPortRanges")
+            if header_ranges:
+                seen = True
+                ranges = intersect_ranges(ranges, [(r["From"], r["To"]) for r in header_ranges])
+    return ranges if seen else []
+
+
+@dataclass
+class PortRangeVerdict:
+    from_port: int
+    to_port: int
+    reachable: bool = None
+    status: str = ""
+    network_insight_analysis_ids: list = field(default_factory=list)
+    explanation_codes: list = field(default_factory=list)
+
+    def to_dict(self):
+        return {
+            "from_port": self.from_port,
+            "to_port": self.to_port,
+            "reachable": self.reachable,
+            "status": self.status,
+            "network_insight_analysis_ids": self.network_insight_analysis_ids,
+            "explanation_codes": self.explanation_codes,
+        }
+
+
+class PortSweep:
+    # Analyzes a whole port range in one path, then narrows down only the sub-ranges whose
+    # outcome isn't settled: by the ports the found path's headers admit, or by bisection.
+    def __init__(self, route_finder, max_workers=DEFAULT_SWEEP_CONCURRENCY, use_headers=True,
+                 max_ambiguous_splits=DEFAULT_MAX_AMBIGUOUS_SPLITS):
+        self.route_finder = route_finder
+        self.max_workers = max_workers
+        self.use_headers = use_headers
+        self.max_ambiguous_splits = max_ambiguous_splits
+        self.analyses = 0
+
+    def analyze(self, source, destination, destination_ip, protocol, port_range) -> RouteFindingResult:
+        with scheduling_priority(BATCH):
+            return self.route_finder.run(source=source, destination=destination, destination_ip=destination_ip,
+                                         protocol=protocol, destination_port_range=port_range,
+                                         show_progress=False)
+
+    def needs_bisection(self, port_range, result: RouteFindingResult) -> bool:
+        # Reachable, but nothing in the found path's headers tells which of its ports are open
+        return result.is_succeed and result.is_reachable and port_range[0] != port_range[1] and \
+            not (self.use_headers and header_port_ranges(result, port_range))
+
+    def split(self, port_range, result: RouteFindingResult):
+        # Returns (settled verdicts, ranges that still need an analysis) for a range that needs no bisection
+        analysis_id = [result.network_insight_analysis_id]
+        if not result.is_succeed:
+            return [PortRangeVerdict(*port_range, status=result.status, network_insight_analysis_ids=analysis_id)], []
+        if not result.is_reachable:
+            return [PortRangeVerdict(*port_range, reachable=False, status=result.status,
+                                     network_insight_analysis_ids=analysis_id,
+                                     explanation_codes=result.explanation_codes)], []
+
+        open_ranges = (header_port_ranges(result, port_range) if self.use_headers else []) or [port_range]
+        verdicts = [PortRangeVerdict(from_port, to_port, reachable=True, status=result.status,
+                                     network_insight_analysis_ids=analysis_id) for from_port, to_port in open_ranges]
+        return verdicts, subtract_ranges(port_range, open_ranges)
+
+    def sweep(self, source: Endpoint, destination: Endpoint = None, destination_ip=None, protocol="tcp",
+              from_port=1, to_port=65535) -> list:
+        verdicts, pending = [], {}
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+
+        def _submit(port_range, ambiguous_splits=0, halves=None):
+            self.analyses += 1
+            pending[executor.submit(self.analyze, source, destination, destination_ip, protocol,
+                                    port_range)] = port_range, ambiguous_splits, halves
+
+        def _settle(port_range, result, ambiguous_splits):
+            if self.needs_bisection(port_range, result):
+                # Both halves of a bisection are settled together, see below
+                middle, halves = (port_range[0] + port_range[1]) // 2, {}
+                _submit((port_range[0], middle), ambiguous_splits, halves)
+                _submit((middle + 1, port_range[1]), ambiguous_splits, halves)
+                return
+            settled, remaining = self.split(port_range, result)
+            verdicts.extend(settled)
+            for gap in remaining:
+                _submit(gap, ambiguous_splits)
+
+        try:
+            _submit((from_port, to_port))
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    port_range, ambiguous_splits, halves = pending.pop(future)
+                    if halves is None:
+                        _settle(port_range, future.result(), ambiguous_splits)
+                        continue
+                    halves[port_range] = future.result()
+                    if len(halves) < 2:
+                        continue
+                    if all(self.needs_bisection(*half) for half in halves.items()):
+                        # Open ports in both halves and no headers to locate them: splitting on could repeat
+                        # this down to one analysis per port, so such splits are capped
+                        ambiguous_splits += 1
+                        if ambiguous_splits > self.max_ambiguous_splits:
+                            verdicts.extend(self.undetermined(*half) for half in halves.items())
+                            continue
+                    for half, result in sorted(halves.items()):
+                        _settle(half, result, ambiguous_splits)
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+        return self.coalesce(verdicts)
+
+    @staticmethod
+    def undetermined(port_range, result: RouteFindingResult) -> PortRangeVerdict:
+        return PortRangeVerdict(*port_range, status=UNDETERMINED,
+                                network_insight_analysis_ids=[result.network_insight_analysis_id])
+
+    @staticmethod
+    def coalesce(verdicts) -> list:
+        merged = []
+        for verdict in sorted(verdicts, key=lambda v: v.from_port):
+            previous = merged[-1] if merged else None
+            if previous and previous.to_port + 1 == verdict.from_port and \
+                    (previous.reachable, previous.status, previous.explanation_codes) == \
+                    (verdict.reachable, verdict.status, verdict.explanation_codes):
+                previous.to_port = verdict.to_port
+                previous.network_insight_analysis_ids += verdict.network_insight_analysis_ids
+            else:
+                merged.append(verdict)
+        return merged
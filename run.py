@@ -1,6 +1,111 @@
+import sys
 import argparse
-from botocore.config import Config
 from routefinder.interfaces.cli import RouteFinderCommand
+from routefinder.interfaces.batch import BatchRunner, load_specs, DEFAULT_CONCURRENCY
+from routefinder.interfaces.fleet import AccountFleet, DEFAULT_FLEET_CONCURRENCY
+from routefinder.interfaces.server import serve, DEFAULT_HOST, DEFAULT_PORT, DEFAULT_REFRESH_INTERVAL
+from routefinder.interfaces.writers import get_writer, WRITERS, CSV_FIELDS
+from routefinder.matrix import ReachabilityMatrix, MATRIX_FIELDS, parse_tag_filters, select_instances
+from routefinder.accounts import AssumedRoleSessions, DEFAULT_ROLE_NAME, list_organization_accounts
+from routefinder.clients import ClientFactory, DEFAULT_MAX_POOL_CONNECTIONS
+from routefinder.history import HistoryStore, DIFF_FIELDS, DEFAULT_HISTORY_PATH
+from routefinder.instrumentation import Instrumentation
+from routefinder.journal import AnalysisJournal
+from routefinder.polling import PollingStrategy
+from routefinder.result_cache import DEFAULT_RESULT_TTL
+from routefinder.snapshot import DEFAULT_SNAPSHOT_TTL
+
+DEFAULT_TRACE_PATH = "routefinder-trace.json"
+
+
+def parse_port_range(value):
+    from_port, _, to_port = value.partition("-")
+    port_range = int(from_port), int(to_port or from_port)
+    if not 0 <= port_range[0] <= port_range[1] <= 65535:
+        raise argparse.ArgumentTypeError(f"invalid port range: {value}")
+    return port_range
+
+
+def run_sweep(command, args):
+    setup_config = command.setup(ask_port=False)
+    verdicts = command.sweep(config=setup_config, from_port=args.sweep[0], to_port=args.sweep[1],
+                             max_workers=args.concurrency)
+    for verdict in verdicts:
+        state = {True: "reachable", False: "blocked"}.get(verdict.reachable, verdict.status)
+        reasons = f" {verdict.explanation_codes}" if verdict.explanation_codes else ""
+        print(f"{verdict.from_port}-{verdict.to_port}\t{state}{reasons}")
+
+
+def run_interactive(command, args):
+    setup_config = command.setup()
+    setup_config.summarize()
+    result = command.run(config=setup_config)
+    for line in result.iter_result(detail=args.verbose):
+        print(line)
+
+
+def open_writer(args, fieldnames=CSV_FIELDS):
+    if args.output:
+        stream = open(args.output, "w", encoding="utf-8", newline="")
+    else:
+        stream = sys.stdout
+    return stream, get_writer(stream, output_format=args.format, path=args.output, fieldnames=fieldnames)
+
+
+def run_matrix(command, args):
+    route_finder = command.route_finder
+    sources = select_instances(route_finder, parse_tag_filters(args.matrix[0]))
+    destinations = select_instances(route_finder, parse_tag_filters(args.matrix[1]))
+    matrix = ReachabilityMatrix(route_finder, max_workers=args.concurrency, verify_samples=args.verify_samples)
+    stream, writer = open_writer(args, fieldnames=MATRIX_FIELDS)
+    try:
+        count = writer.write_all(matrix.run(sources, destinations, protocol=args.protocol,
+                                            destination_port=args.port))
+    finally:
+        if stream is not sys.stdout:
+            stream.close()
+    print(f"Projected {count} pairs from {matrix.analyses} analyses "
+          f"({matrix.mismatches} verification mismatches)", file=sys.stderr)
+
+
+def run_label(args):
+    # What a run checked, so --diff compares like with like; prompted checks have no label
+    if args.batch:
+        label = f"batch {args.batch}"
+    elif args.matrix:
+        label = f"matrix {' '.join(args.matrix)} {args.protocol}/{args.port}"
+    else:
+        return None
+    for option in ("region", "regions", "accounts"):
+        if getattr(args, option):
+            label += f" --{option} {getattr(args, option)}"
+    return label
+
+
+def run_diff(history, args):
+    before_run_id, after_run_id = args.diff if args.diff else history.latest_comparable_run_ids()
+    changes = history.diff(before_run_id, after_run_id)
+    stream, writer = open_writer(args, fieldnames=DIFF_FIELDS)
+    try:
+        writer.write_all(changes)
+    finally:
+        if stream is not sys.stdout:
+            stream.close()
+    print(f"{len(changes)} reachability changes between runs {before_run_id} and {after_run_id}", file=sys.stderr)
+    return 1 if changes else 0
+
+
+def run_batch(command, args):
+    specs = load_specs(args.batch)
+    runner = command if isinstance(command, AccountFleet) else BatchRunner(command=command,
+                                                                           max_workers=args.concurrency)
+    stream, writer = open_writer(args)
+    try:
+        count = runner.write(specs, writer)
+    finally:
+        if stream is not sys.stdout:
+            stream.close()
+    print(f"Finished {count} reachability checks", file=sys.stderr)
 
 
 if __name__ == "__main__":
@@ -11,20 +116,136 @@ if __name__ == "__main__":
     parser.add_argument('-v', '--verbose',
                         action='store_true')
     parser.add_argument('-r', '--region')
+    parser.add_argument('--refresh', action='store_true',
+                        help='ignore the cached inventory snapshot and reload it from EC2')
+    parser.add_argument('--cache-ttl', type=int, default=DEFAULT_SNAPSHOT_TTL,
+                        help='inventory snapshot lifetime in seconds (0 disables the snapshot)')
+    parser.add_argument('-b', '--batch',
+                        help='run the reachability checks listed in a YAML/CSV/JSONL file without prompting')
+    parser.add_argument('-o', '--output',
+                        help='write batch results to this file instead of stdout')
+    parser.add_argument('--format', choices=sorted(WRITERS),
+                        help='batch output format (default: csv for a .csv output file, otherwise jsonl)')
+    parser.add_argument('-c', '--concurrency', type=int, default=DEFAULT_CONCURRENCY,
+                        help='maximum number of analyses running at once in batch mode')
+    parser.add_argument('--poll-timeout', type=float, default=PollingStrategy.deadline,
+                        help='give up waiting for an analysis after this many seconds')
+    parser.add_argument('--result-ttl', type=int, default=0,
+                        help='reuse an earlier result for up to this many seconds while the route tables, '
+                             'security groups, network ACLs and ENIs involved are unchanged (0 disables)')
+    parser.add_argument('--preflight', action='store_true',
+                        help='skip the analysis when local route table, security group and network ACL checks '
+                             'already show the path is blocked')
+    parser.add_argument('--regions',
+                        help='comma separated regions to load and search together, or "all" for every enabled region')
+    parser.add_argument('--accounts',
+                        help='comma separated member accounts to sweep in batch mode, or "org" for every active '
+                             'account in the organization')
+    parser.add_argument('--role-name', default=DEFAULT_ROLE_NAME,
+                        help='role assumed in each member account')
+    parser.add_argument('--fleet-concurrency', type=int, default=DEFAULT_FLEET_CONCURRENCY,
+                        help='maximum number of accounts loaded and analyzed at once')
+    parser.add_argument('--max-pool-connections', type=int, default=DEFAULT_MAX_POOL_CONNECTIONS,
+                        help='HTTP connections kept open per AWS client')
+    parser.add_argument('--profile', nargs='?', const=DEFAULT_TRACE_PATH,
+                        help='print per-API-call latency, retry, throttle and payload statistics on exit and '
+                             f'write a Chrome trace file (default: {DEFAULT_TRACE_PATH})')
+    parser.add_argument('--serve', nargs='?', const=f"{DEFAULT_HOST}:{DEFAULT_PORT}", metavar='[HOST:]PORT',
+                        help='keep the inventory warm and answer reachability queries over HTTP '
+                             f'(default: {DEFAULT_HOST}:{DEFAULT_PORT})')
+    parser.add_argument('--refresh-interval', type=int, default=DEFAULT_REFRESH_INTERVAL,
+                        help='seconds between background inventory refreshes in server mode (0 disables)')
+    parser.add_argument('--matrix', nargs=2, metavar=('SOURCE_TAGS', 'DESTINATION_TAGS'),
+                        help='check every tagged source instance against every tagged destination instance, '
+                             'e.g. --matrix tier=web tier=db; one analysis runs per subnet/security group class pair')
+    parser.add_argument('--protocol', default='tcp', choices=['tcp', 'udp'],
+                        help='protocol for --matrix')
+    parser.add_argument('--port', type=int, default=80,
+                        help='destination port for --matrix')
+    parser.add_argument('--verify-samples', type=int, default=0,
+                        help='extra member pairs analyzed per class pair to verify the projected verdict')
+    parser.add_argument('--sweep', type=parse_port_range, metavar='FROM-TO',
+                        help='find the reachable and blocked ports in a range, analyzing whole sub-ranges at once '
+                             'and splitting only where the outcome changes')
+    parser.add_argument('--journal', metavar='PATH',
+                        help='append created paths, started analyses and results to this file; rerunning with the '
+                             'same journal after a crash reuses finished results and resumes polling unfinished '
+                             'analyses instead of starting them again; journaled results expire after --result-ttl '
+                             f'seconds ({DEFAULT_RESULT_TTL} when it is 0)')
+    parser.add_argument('--history', nargs='?', const=DEFAULT_HISTORY_PATH, metavar='PATH',
+                        help='store every result, with its explanations and path components, as a new run in this '
+                             f'SQLite file (default: {DEFAULT_HISTORY_PATH})')
+    parser.add_argument('--diff', nargs='*', type=int, metavar='RUN_ID',
+                        help='report reachability changes between two stored runs (default: the latest two runs of the '
+                             'same batch file or matrix) and exit with 1 when there are any')
     args = parser.parse_args()
+    if args.accounts and not args.batch:
+        parser.error("--accounts requires --batch")
+    if args.accounts and (args.matrix or args.serve):
+        parser.error("--accounts can't be combined with --matrix or --serve")
+    if args.diff is not None and len(args.diff) not in (0, 2):
+        parser.error("--diff takes either no run IDs or two")
+
+    if args.diff is not None:
+        history = HistoryStore(args.history or DEFAULT_HISTORY_PATH)
+        try:
+            if not args.diff and len(history.latest_comparable_run_ids()) < 2:
+                parser.error("--diff needs two stored runs of the same batch file or matrix; pass RUN_ID RUN_ID "
+                             "to compare any two runs")
+            status = run_diff(history, args)
+        finally:
+            history.close()
+        exit(status)
 
     boto_config = None
     if args.region:
+        from botocore.config import Config
+
         boto_config = Config(region_name=args.region)
         print("Target Region:", args.region)
 
+    instrumentation = Instrumentation() if args.profile else None
+    journal = AnalysisJournal(args.journal, ttl=args.result_ttl or DEFAULT_RESULT_TTL) if args.journal else None
+    history = HistoryStore(args.history) if args.history else None
+    if history is not None:
+        history.start_run(label=run_label(args))
     try:
-        command = RouteFinderCommand(boto_config=boto_config)
-        setup_config = command.setup()
-        setup_config.summarize()
-        result = command.run(config=setup_config)
-        print(result.get_result(detail=args.verbose))
+        clients = ClientFactory(config=boto_config, max_pool_connections=args.max_pool_connections)
+        command_kwargs = dict(clients=clients, instrumentation=instrumentation, journal=journal,
+                              history=history, refresh=args.refresh, snapshot_ttl=args.cache_ttl,
+                              polling=PollingStrategy(deadline=args.poll_timeout),
+                              result_ttl=args.result_ttl,
+                              preflight=args.preflight,
+                              regions=args.regions.split(",") if args.regions else None)
+        if args.accounts:
+            sessions = AssumedRoleSessions(role_name=args.role_name, clients=clients)
+            accounts = list_organization_accounts(clients) if args.accounts == "org" \
+                else args.accounts.split(",")
+            command = AccountFleet(sessions=sessions, accounts=accounts, max_workers=args.fleet_concurrency,
+                                   concurrency=args.concurrency, **command_kwargs)
+        else:
+            command = RouteFinderCommand(**command_kwargs)
+        if args.matrix:
+            run_matrix(command, args)
+        elif args.serve:
+            host, _, port = args.serve.rpartition(":")
+            serve(command, host=host or DEFAULT_HOST, port=int(port), refresh_interval=args.refresh_interval)
+        elif args.batch:
+            run_batch(command, args)
+        elif args.sweep:
+            run_sweep(command, args)
+        else:
+            run_interactive(command, args)
 
     except KeyboardInterrupt as e:
         print("Exit RouteFinder")
         exit(0)
+    finally:
+        if journal is not None:
+            journal.close()
+        if history is not None:
+            history.close()
+        if instrumentation is not None:
+            print(instrumentation.format_summary(), file=sys.stderr)
+            instrumentation.write_trace(args.profile)
+            print(f"Trace written to {args.profile}", file=sys.stderr)
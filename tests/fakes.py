@@ -0,0 +1,101 @@
+import itertools
+import threading
+from types import SimpleNamespace
+
+from botocore.exceptions import ClientError
+
+from routefinder.dto import NetworkInterface, RouteFindingResult
+from routefinder.polling import PollingStrategy
+
+FAST_POLLING = PollingStrategy(initial_delay=0, min_delay=0.01, max_delay=0.05, jitter=0, deadline=5)
+
+
+def make_eni(index, ip, subnet_id="subnet-a", group_ids=("sg-1",), interface_type="interface", instance_id=""):
+    row = {"NetworkInterfaceId": f"eni-{index}", "InterfaceType": interface_type, "PrivateIpAddress": ip,
+           "PrivateIpAddresses": [{"PrivateIpAddress": ip}], "SubnetId": subnet_id, "VpcId": "vpc-1",
+           "Groups": [{"GroupId": group_id} for group_id in group_ids]}
+    if instance_id:
+        row["Attachment"] = {"InstanceId": instance_id}
+    return NetworkInterface.from_response(row)
+
+
+def make_result(status="succeeded", reachable=True, explanation_codes=(), analysis_id="nia-1", **kwargs):
+    analysis = {"NetworkInsightsAnalysisId": analysis_id, "Status": status}
+    if status == "succeeded":
+        analysis["NetworkPathFound"] = reachable
+        analysis["Explanations"] = [{"ExplanationCode": code} for code in explanation_codes]
+    return RouteFindingResult(network_insight_path_id="nip-1", network_insight_analysis_id=analysis_id,
+                              detail={"NetworkInsightsAnalyses": [analysis]}, **kwargs)
+
+
+def not_found(analysis_ids):
+    return ClientError({"Error": {"Code": "InvalidNetworkInsightsAnalysisId.NotFound",
+                                  "Message": f"The analysis IDs '{', '.join(analysis_ids)}' do not exist"},
+                        "ResponseMetadata": {"HTTPStatusCode": 400}}, "DescribeNetworkInsightsAnalyses")
+
+
+class FakePaginator:
+    def __init__(self, client, operation_name):
+        self.client = client
+        self.operation_name = operation_name
+
+    def paginate(self, **kwargs):
+        yield self.client.call(self.operation_name, **kwargs)
+
+
+class FakeEc2Client:
+    # Stands in for a boto3 EC2 client. Analyses answer "running" for running_polls describes and then
+    # succeed with reachable; IDs it never started are rejected like EC2 does, for the whole request.
+    def __init__(self, region_name="us-east-1", running_polls=0, reachable=True):
+        self.meta = SimpleNamespace(region_name=region_name)
+        self.running_polls = running_polls
+        self.reachable = reachable
+        self.analyses = {}
+        self.calls = []
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def get_paginator(self, operation_name):
+        return FakePaginator(self, operation_name)
+
+    def call(self, operation_name, **kwargs):
+        with self._lock:
+            self.calls.append((operation_name, kwargs))
+        return getattr(self, f"_{operation_name}")(**kwargs)
+
+    def __getattr__(self, operation_name):
+        if operation_name.startswith("_"):
+            raise AttributeError(operation_name)
+        return lambda **kwargs: self.call(operation_name, **kwargs)
+
+    def count(self, operation_name):
+        return sum(name == operation_name for name, _ in self.calls)
+
+    def start(self, running_polls=None) -> str:
+        analysis_id = f"nia-{next(self._ids)}"
+        with self._lock:
+            self.analyses[analysis_id] = self.running_polls if running_polls is None else running_polls
+        return analysis_id
+
+    def _describe_network_insights_paths(self, **kwargs):
+        return {"NetworkInsightsPaths": []}
+
+    def _create_network_insights_path(self, **kwargs):
+        return {"NetworkInsightsPath": {"NetworkInsightsPathId": f"nip-{next(self._ids)}"}}
+
+    def _start_network_insights_analysis(self, NetworkInsightsPathId):
+        return {"NetworkInsightsAnalysis": {"NetworkInsightsAnalysisId": self.start()}}
+
+    def _describe_network_insights_analyses(self, NetworkInsightsAnalysisIds, **kwargs):
+        unknown = [i for i in NetworkInsightsAnalysisIds if i not in self.analyses]
+        if unknown:
+            raise not_found(unknown)
+        analyses = []
+        with self._lock:
+            for analysis_id in NetworkInsightsAnalysisIds:
+                self.analyses[analysis_id] -= 1
+                analysis = {"NetworkInsightsAnalysisId": analysis_id, "Status": "running"}
+                if self.analyses[analysis_id] < 0:
+                    analysis.update(Status="succeeded", NetworkPathFound=self.reachable)
+                analyses.append(analysis)
+        return {"NetworkInsightsAnalyses": analyses}
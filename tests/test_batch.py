@@ -0,0 +1,88 @@
+import os
+import time
+import signal
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from routefinder.dto import NetworkInterface
+from routefinder.interfaces.batch import BatchRunner
+
+ANALYSIS_SECONDS = 0.2
+
+
+class FakeResult:
+    def to_dict(self):
+        return {"status": "succeeded", "is_reachable": True}
+
+
+class FakeCommand:
+    def __init__(self):
+        self.config_factory = SimpleNamespace(build=lambda **kwargs: SimpleNamespace(**kwargs))
+        self.started = 0
+        self._lock = threading.Lock()
+
+    def run(self, config, sync_flag=True, show_progress=True):
+        with self._lock:
+            self.started += 1
+        time.sleep(ANALYSIS_SECONDS)
+        return FakeResult()
+
+
+def make_specs(count):
+    return [{"source_type": "EC2", "source": f"i-{i:017x}", "destination_type": "IP", "destination": "10.0.0.1",
+             "destination_port": 443} for i in range(count)]
+
+
+def test_run_yields_a_record_per_spec():
+    command = FakeCommand()
+    records = list(BatchRunner(command=command, max_workers=4).run(make_specs(8)))
+    assert len(records) == 8
+    assert all(record["is_reachable"] for record in records)
+
+
+def test_bad_spec_is_reported_without_stopping_the_batch():
+    records = list(BatchRunner(command=FakeCommand(), max_workers=2).run([{"source": "i-1"}] + make_specs(2)))
+    assert sum("error" in record for record in records) == 1
+
+
+def test_ctrl_c_cancels_queued_specs():
+    command = FakeCommand()
+    runner = BatchRunner(command=command, max_workers=4)
+    timer = threading.Timer(ANALYSIS_SECONDS / 2, os.kill, (os.getpid(), signal.SIGINT))
+    started = time.monotonic()
+    timer.start()
+    with pytest.raises(KeyboardInterrupt):
+        list(runner.run(make_specs(40)))
+    elapsed = time.monotonic() - started
+    time.sleep(ANALYSIS_SECONDS * 2)
+    assert command.started == 4
+    assert elapsed < ANALYSIS_SECONDS * 2
+
+
+class FakeRouteFinder:
+    def __init__(self, hosts, enis):
+        self.hosts = hosts
+        self.enis = enis
+
+    def get_hosts_by_name(self, fqdn):
+        return self.hosts[fqdn]
+
+    def resolve_ip(self, ip):
+        return self.enis.get(ip)
+
+
+def test_name_on_several_enis_is_checked_per_address():
+    command = FakeCommand()
+    command.route_finder = FakeRouteFinder(
+        hosts={"lb.internal": ["10.0.1.10", "10.0.2.10", "203.0.113.1"], "db.internal": ["10.0.3.10"]},
+        enis={ip: NetworkInterface.from_response({"NetworkInterfaceId": f"eni-{i}", "PrivateIpAddress": ip})
+              for i, ip in enumerate(["10.0.1.10", "10.0.2.10", "10.0.3.10"])})
+    runner = BatchRunner(command=command)
+    spec = {"source_type": "EC2", "source": "i-1", "destination_type": "FQDN", "destination": "lb.internal"}
+
+    expanded = runner.expand_spec(spec)
+    assert [(s["destination_type"], s["destination"]) for s in expanded] == [("IP", "10.0.1.10"), ("IP", "10.0.2.10")]
+    assert {s["destination_fqdn"] for s in expanded} == {"lb.internal"}
+    assert runner.expand_spec(dict(spec, destination="db.internal")) == [dict(spec, destination="db.internal")]
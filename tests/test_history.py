@@ -0,0 +1,68 @@
+import threading
+
+import pytest
+
+from routefinder.history import HistoryStore
+
+from fakes import make_result
+
+
+def path(source, port=443):
+    return {"Source": source, "Destination": "eni-db", "Protocol": "tcp", "DestinationPort": port}
+
+
+@pytest.fixture
+def history(tmp_path):
+    history = HistoryStore(str(tmp_path / "history.sqlite"))
+    yield history
+    history.close()
+
+
+def test_diff_reports_only_changed_paths(history):
+    before = history.start_run(label="batch paths.yaml")
+    history.record(path("eni-1"), make_result(reachable=True))
+    history.record(path("eni-2"), make_result(reachable=False, explanation_codes=["ENI_SG_RULES_MISMATCH"]))
+    history.record(path("eni-3"), make_result(reachable=True))
+    history.record(path("eni-4"), make_result(reachable=False, explanation_codes=["ENI_SG_RULES_MISMATCH"]))
+    history.record(path("eni-5"), make_result(reachable=True))
+    after = history.start_run(label="batch paths.yaml")
+    history.record(path("eni-1"), make_result(reachable=False, explanation_codes=["ENI_SG_RULES_MISMATCH"]))
+    history.record(path("eni-2"), make_result(reachable=True))
+    history.record(path("eni-3"), make_result(reachable=True))
+    history.record(path("eni-4"), make_result(reachable=False, explanation_codes=["SUBNET_ACL_RESTRICTION"]))
+    history.record(path("eni-6"), make_result(reachable=True))
+
+    changes = {c["source"]: c for c in history.diff(before, after)}
+    assert {source: c["change"] for source, c in changes.items()} == {
+        "eni-1": "closed", "eni-2": "opened", "eni-4": "changed", "eni-5": "removed", "eni-6": "added"}
+    assert changes["eni-1"]["after_explanation_codes"] == "ENI_SG_RULES_MISMATCH"
+    assert (changes["eni-1"]["before_reachable"], changes["eni-1"]["after_reachable"]) == (True, False)
+    assert history.diff(after, after) == []
+
+
+def test_concurrent_records_share_one_run(history):
+    threads = [threading.Thread(target=history.record, args=(path(f"eni-{i}"), make_result())) for i in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    runs = history.runs()
+    assert [run["results"] for run in runs] == [16]
+
+
+def test_default_diff_compares_runs_of_the_same_checks(history):
+    first = history.start_run(label="batch paths.yaml")
+    history.start_run(label="batch other.yaml")
+    second = history.start_run(label="batch paths.yaml")
+    history.start_run(label=None)
+    assert history.latest_comparable_run_ids() == [first, second]
+
+
+def test_query_and_detail(history):
+    history.start_run()
+    history.record(path("eni-1", port=22), make_result(reachable=False, explanation_codes=["NO_ROUTE"]))
+    history.record(path("eni-1", port=443), make_result(reachable=True))
+    rows = history.query(source="eni-1", destination_port=22)
+    assert [(row["from_port"], row["is_reachable"], row["explanation_codes"]) for row in rows] == [(22, 0, "NO_ROUTE")]
+    assert history.get_result(rows[0]["id"]).explanation_codes == ["NO_ROUTE"]
+    assert len(history.query(reachable=True)) == 1
@@ -0,0 +1,31 @@
+import os
+import sys
+import json
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ("boto3", "botocore", "InquirerPy", "prompt_toolkit", "emoji", "tqdm")
+IMPORT_BUDGET = 0.5
+
+PROBE = f"""
+import sys, json, time
+started = time.perf_counter()
+import routefinder.interfaces.cli
+elapsed = time.perf_counter() - started
+print(json.dumps({{"elapsed": elapsed, "loaded": [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))
+"""
+
+
+def probe_import():
+    # A fresh interpreter, so modules imported by the test runner don't count
+    output = subprocess.run([sys.executable, "-c", PROBE], cwd=ROOT, check=True, capture_output=True, text=True)
+    return json.loads(output.stdout)
+
+
+def test_cli_import_loads_no_heavy_modules():
+    assert probe_import()["loaded"] == []
+
+
+def test_cli_import_stays_within_budget():
+    elapsed = min(probe_import()["elapsed"] for _ in range(3))
+    assert elapsed < IMPORT_BUDGET, f"importing routefinder.interfaces.cli took {elapsed:.3f}s"
@@ -0,0 +1,83 @@
+import pytest
+
+from routefinder.app import RouteFinder
+from routefinder.journal import AnalysisJournal
+
+from fakes import FAST_POLLING, FakeEc2Client, make_eni, make_result
+
+KEY = ("us-east-1", '{"Protocol":"tcp","Source":"eni-1"}')
+
+
+@pytest.fixture
+def journal_path(tmp_path):
+    return str(tmp_path / "journal.jsonl")
+
+
+def reopen(journal, **kwargs):
+    journal.close()
+    return AnalysisJournal(journal.path, fsync=False, **kwargs)
+
+
+def test_results_survive_a_restart(journal_path):
+    journal = AnalysisJournal(journal_path, fsync=False)
+    journal.record_analysis(KEY, "nip-1", "nia-1")
+    journal.record_result(KEY, make_result(analysis_id="nia-1"))
+    journal = reopen(journal)
+    assert journal.pending() == {}
+    assert journal.get_result(KEY).cached
+    assert journal.get_result(KEY).is_reachable
+
+
+def test_only_failed_analyses_are_closed(journal_path):
+    journal = AnalysisJournal(journal_path, fsync=False)
+    for i, result in enumerate([make_result(status="failed"), make_result(status="running"),
+                                make_result(status="running", timed_out=True)]):
+        key = (KEY[0], f"path-{i}")
+        journal.record_analysis(key, "nip-1", result.network_insight_analysis_id)
+        journal.record_result(key, result)
+    journal = reopen(journal)
+    assert sorted(journal.pending()) == [(KEY[0], "path-1"), (KEY[0], "path-2")]
+    assert all(journal.get_result((KEY[0], f"path-{i}")) is None for i in range(3))
+
+
+def test_results_and_unfinished_analyses_expire(journal_path):
+    journal = AnalysisJournal(journal_path, fsync=False)
+    journal.record_analysis(KEY, "nip-1", "nia-1")
+    journal.record_result(KEY, make_result(analysis_id="nia-1"))
+    journal.record_analysis((KEY[0], "other"), "nip-2", "nia-2")
+    journal = reopen(journal, ttl=0)
+    assert journal.get_result(KEY) is None
+    assert journal.pending() == {}
+
+
+def test_torn_last_line_is_skipped(journal_path):
+    journal = AnalysisJournal(journal_path, fsync=False)
+    journal.record_analysis(KEY, "nip-1", "nia-1")
+    journal._stream.write('{"event": "resu')
+    journal = reopen(journal)
+    assert journal.pending() == {KEY: ("nip-1", "nia-1")}
+    journal.record_result(KEY, make_result(analysis_id="nia-1"))
+    assert reopen(journal).pending() == {}
+
+
+def test_resume_polls_unfinished_analyses_instead_of_starting_them_again(journal_path):
+    source, destination = make_eni(1, "10.0.1.10"), make_eni(2, "10.0.1.20")
+    kwargs = RouteFinder.build_path_kwargs(source=source, destination=destination, destination_port=443)
+    client = FakeEc2Client()
+    analysis_id = client.start()
+    journal = AnalysisJournal(journal_path, fsync=False)
+    journal.record_analysis(journal.key("us-east-1", kwargs), "nip-1", analysis_id)
+
+    route_finder = RouteFinder(client, preload=False, polling=FAST_POLLING, journal=reopen(journal))
+    for eni in (source, destination):
+        route_finder.index_eni(eni)
+    route_finder.resume_journal()
+    result = route_finder.run(source=source, destination=destination, destination_port=443, show_progress=False)
+
+    assert result.network_insight_analysis_id == analysis_id
+    assert result.is_reachable
+    assert client.count("start_network_insights_analysis") == 0
+    assert route_finder.journal.pending() == {}
+    again = route_finder.run(source=source, destination=destination, destination_port=443, show_progress=False)
+    assert again.cached
+    assert client.count("describe_network_insights_analyses") == 1
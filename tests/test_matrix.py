@@ -0,0 +1,62 @@
+import threading
+
+from routefinder.matrix import ReachabilityMatrix, equivalence_key
+
+from fakes import make_eni, make_result
+
+
+class FakeRouteFinder:
+    # Only the database subnet is reachable, so every answer is decided by the destination's class
+    def __init__(self):
+        self.analyzed = []
+        self._lock = threading.Lock()
+
+    def get_enis_by_endpoint(self, endpoint):
+        return [endpoint]
+
+    def run(self, source, destination, protocol, destination_port, show_progress):
+        with self._lock:
+            self.analyzed.append((source.id, destination.id))
+        reachable = destination.SubnetId == "subnet-db"
+        return make_result(reachable=reachable, explanation_codes=() if reachable else ["ENI_SG_RULES_MISMATCH"],
+                           analysis_id=f"nia-{source.id}-{destination.id}")
+
+
+WEB = [make_eni(i, f"10.0.1.{i}", subnet_id="subnet-web", group_ids=("sg-web",)) for i in range(1, 4)]
+DB = [make_eni(i, f"10.0.2.{i}", subnet_id="subnet-db", group_ids=("sg-db",)) for i in range(4, 6)]
+ADMIN = make_eni(6, "10.0.1.6", subnet_id="subnet-web", group_ids=("sg-web", "sg-admin"))
+
+
+def test_equivalence_key_covers_subnet_and_security_groups():
+    route_finder = FakeRouteFinder()
+    assert equivalence_key(route_finder, WEB[0]) == equivalence_key(route_finder, WEB[1])
+    assert equivalence_key(route_finder, WEB[0]) != equivalence_key(route_finder, ADMIN)
+    assert equivalence_key(route_finder, ADMIN) == "subnet-web|sg-admin+sg-web"
+
+
+def test_one_analysis_per_class_pair_is_projected_onto_every_member():
+    route_finder = FakeRouteFinder()
+    matrix = ReachabilityMatrix(route_finder, max_workers=2)
+    records = list(matrix.run(WEB + [ADMIN], DB + WEB, destination_port=5432))
+
+    assert len(matrix.classify(WEB + [ADMIN])) == 2
+    assert matrix.analyses == len(route_finder.analyzed) == 4
+    # Every ordered pair except an ENI with itself
+    assert len(records) == 4 * 5 - 3
+    by_pair = {(r["source"], r["destination"]): r for r in records}
+    assert all(by_pair[(s.id, d.id)]["is_reachable"] for s in WEB + [ADMIN] for d in DB)
+    assert not any(by_pair[(s.id, d.id)]["is_reachable"] for s in WEB + [ADMIN] for d in WEB if s.id != d.id)
+    representatives = {pair for pair, r in by_pair.items() if r["representative"]}
+    assert representatives == set(route_finder.analyzed)
+    assert all(r["verified"] is None for r in records)
+
+
+def test_sampled_pairs_verify_the_representative():
+    route_finder = FakeRouteFinder()
+    matrix = ReachabilityMatrix(route_finder, verify_samples=2, seed=1)
+    records = list(matrix.run(WEB, DB, destination_port=5432))
+
+    assert matrix.analyses == len(route_finder.analyzed) == 3
+    assert matrix.mismatches == 0
+    assert sum(r["representative"] for r in records) == 3
+    assert all(r["verified"] is True for r in records)
@@ -0,0 +1,69 @@
+import dataclasses
+
+import pytest
+from botocore.exceptions import ClientError
+
+from routefinder.poller import AnalysisPoller
+
+from fakes import FAST_POLLING, FakeEc2Client
+
+TIMEOUT = 5
+
+
+def submit(poller, analysis_ids):
+    return [poller.submit(network_insight_analysis_id=i, network_insight_path_id="nip-1") for i in analysis_ids]
+
+
+def test_due_analyses_are_described_in_one_call():
+    client = FakeEc2Client()
+    analysis_ids = [client.start() for _ in range(3)]
+    # Held back long enough for all three to be submitted before the first poll
+    poller = AnalysisPoller(ec2_client=client, strategy=dataclasses.replace(FAST_POLLING, initial_delay=0.2,
+                                                                             min_delay=0.1))
+    futures = submit(poller, analysis_ids)
+
+    results = [future.result(TIMEOUT) for future in futures]
+    assert [r.network_insight_analysis_id for r in results] == analysis_ids
+    assert all(r.is_succeed and r.is_reachable for r in results)
+    assert client.count("describe_network_insights_analyses") == 1
+    assert sorted(client.calls[0][1]["NetworkInsightsAnalysisIds"]) == sorted(analysis_ids)
+
+
+def test_running_analyses_are_polled_until_done():
+    client = FakeEc2Client(running_polls=2)
+    poller = AnalysisPoller(ec2_client=client, strategy=FAST_POLLING)
+    result, = [future.result(TIMEOUT) for future in submit(poller, [client.start()])]
+    assert result.is_succeed
+    assert client.count("describe_network_insights_analyses") == 3
+    assert poller.histograms["succeeded"].count == 1
+
+
+def test_unknown_id_fails_alone():
+    client = FakeEc2Client()
+    analysis_ids = [client.start(), client.start(), "nia-deleted", client.start()]
+    poller = AnalysisPoller(ec2_client=client, strategy=dataclasses.replace(FAST_POLLING, initial_delay=0.2,
+                                                                             min_delay=0.1))
+    futures = dict(zip(analysis_ids, submit(poller, analysis_ids)))
+
+    with pytest.raises(ClientError):
+        futures.pop("nia-deleted").result(TIMEOUT)
+    assert all(future.result(TIMEOUT).is_succeed for future in futures.values())
+
+
+def test_deadline_expiry_returns_a_timed_out_result():
+    client = FakeEc2Client(running_polls=10 ** 6)
+    poller = AnalysisPoller(ec2_client=client, strategy=dataclasses.replace(FAST_POLLING, deadline=0.2))
+    result, = [future.result(TIMEOUT) for future in submit(poller, [client.start()])]
+    assert result.timed_out
+    assert result.status == "timed-out"
+    assert not result.is_running
+    assert poller.pending_count == 0
+
+
+def test_resumed_analysis_is_kept_out_of_the_histograms():
+    client = FakeEc2Client()
+    poller = AnalysisPoller(ec2_client=client, strategy=dataclasses.replace(FAST_POLLING, initial_delay=60))
+    future = poller.submit(network_insight_analysis_id=client.start(), network_insight_path_id="nip-1",
+                           resumed=True)
+    assert future.result(TIMEOUT).is_succeed
+    assert "succeeded" not in poller.histograms
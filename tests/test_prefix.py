@@ -0,0 +1,45 @@
+import threading
+
+from routefinder.prefix import PrefixIndex
+
+
+def test_longest_prefix_wins():
+    index = PrefixIndex([("10.0.0.0/16", "vpc"), ("10.0.1.0/24", "subnet"), ("10.0.1.10", "eni")])
+    assert index.lookup("10.0.1.10") == "eni"
+    assert index.lookup("10.0.1.11") == "subnet"
+    assert index.lookup("10.0.2.1") == "vpc"
+    assert index.lookup("192.168.0.1") is None
+    assert [prefix_len for prefix_len, _ in index.iter_matches("10.0.1.10")] == [32, 24, 16]
+
+
+def test_non_ipv4_input_is_ignored():
+    index = PrefixIndex([("2001:db8::/32", "ipv6"), ("not-an-ip", "bad"), ("0.0.0.0/0", "default")])
+    assert len(index) == 1
+    assert index.lookup("8.8.8.8") == "default"
+    assert index.lookup("example.com") is None
+    assert index.lookup(None) is None
+
+
+def test_lookups_survive_concurrent_clear():
+    index = PrefixIndex()
+    errors = []
+    stopped = threading.Event()
+
+    def _lookup():
+        while not stopped.is_set():
+            try:
+                index.lookup("10.0.1.10")
+            except Exception as e:
+                errors.append(e)
+                return
+
+    readers = [threading.Thread(target=_lookup) for _ in range(4)]
+    for reader in readers:
+        reader.start()
+    for _ in range(2000):
+        index.update((f"10.0.{i}.0/{16 + i}", i) for i in range(17))
+        index.clear()
+    stopped.set()
+    for reader in readers:
+        reader.join()
+    assert errors == []
@@ -0,0 +1,84 @@
+import pytest
+
+from routefinder.preflight import PreflightEvaluator
+
+from fakes import make_eni
+
+ALLOW_ALL = [{"IpProtocol": "-1", "IpRanges": [{"CidrIp": "0.0.0.0/0"}]}]
+
+
+class FakeRouteFinder:
+    def get_enis_by_endpoint(self, endpoint):
+        return [endpoint]
+
+
+@pytest.fixture
+def evaluator():
+    evaluator = PreflightEvaluator(ec2_client=None)
+    evaluator.main_route_tables["vpc-1"] = {"RouteTableId": "rtb-main", "Routes": [
+        {"DestinationCidrBlock": "10.0.0.0/16", "State": "active"}]}
+    evaluator.security_groups = {
+        "sg-web": {"GroupId": "sg-web", "IpPermissionsEgress": ALLOW_ALL, "IpPermissions": [
+            {"IpProtocol": "tcp", "FromPort": 443, "ToPort": 443, "IpRanges": [{"CidrIp": "10.0.0.0/16"}]}]},
+        "sg-db": {"GroupId": "sg-db", "IpPermissionsEgress": ALLOW_ALL, "IpPermissions": [
+            {"IpProtocol": "tcp", "FromPort": 5432, "ToPort": 5432, "UserIdGroupPairs": [{"GroupId": "sg-web"}]}]},
+        "sg-closed": {"GroupId": "sg-closed", "IpPermissionsEgress": [], "IpPermissions": []},
+    }
+    return evaluator
+
+
+def evaluate(evaluator, source, destination=None, destination_ip=None, port=443):
+    return evaluator.evaluate(FakeRouteFinder(), source=source, destination=destination, protocol="tcp",
+                              destination_ip=destination_ip, destination_port=port)
+
+
+def test_allowed_path_is_left_to_the_analyzer(evaluator):
+    web = make_eni(1, "10.0.1.10", group_ids=("sg-web",))
+    db = make_eni(2, "10.0.1.20", group_ids=("sg-db",))
+    assert not evaluate(evaluator, web, make_eni(3, "10.0.1.30", group_ids=("sg-web",))).blocked
+    assert not evaluate(evaluator, web, db, port=5432).blocked
+
+
+def test_missing_route_is_blocked(evaluator):
+    verdict = evaluate(evaluator, make_eni(1, "10.0.1.10", group_ids=("sg-web",)), destination_ip="8.8.8.8")
+    assert verdict.blocked
+    assert (verdict.explanation_code, verdict.component_id) == ("NO_ROUTE_TO_DESTINATION", "rtb-main")
+
+
+def test_security_groups_block_in_either_direction(evaluator):
+    web = make_eni(1, "10.0.1.10", group_ids=("sg-web",))
+    verdict = evaluate(evaluator, make_eni(2, "10.0.1.20", group_ids=("sg-closed",)), web)
+    assert (verdict.blocked, verdict.explanation_code, verdict.direction) == (True, "ENI_SG_RULES_MISMATCH", "egress")
+    verdict = evaluate(evaluator, web, make_eni(3, "10.0.1.30", group_ids=("sg-db",)), port=22)
+    assert (verdict.blocked, verdict.explanation_code, verdict.direction) == (True, "ENI_SG_RULES_MISMATCH", "ingress")
+
+
+def test_network_acl_blocks_across_subnets(evaluator):
+    evaluator.network_acls["subnet-b"] = {"NetworkAclId": "acl-b", "Entries": [
+        {"RuleNumber": 100, "Egress": False, "Protocol": "6", "PortRange": {"From": 22, "To": 22},
+         "CidrBlock": "0.0.0.0/0", "RuleAction": "allow"}]}
+    web = make_eni(1, "10.0.1.10", group_ids=("sg-web",))
+    verdict = evaluate(evaluator, web, make_eni(2, "10.0.2.10", subnet_id="subnet-b", group_ids=("sg-web",)))
+    assert (verdict.blocked, verdict.component_id, verdict.direction) == (True, "acl-b", "ingress")
+
+
+def test_enis_without_enforced_security_groups_are_not_blocked(evaluator):
+    web = make_eni(1, "10.0.1.10", group_ids=("sg-web",))
+    nat = make_eni(2, "10.0.1.1", group_ids=(), interface_type="nat_gateway")
+    assert not evaluate(evaluator, web, nat, port=80).blocked
+
+
+def test_unknown_rules_are_never_predicted_as_blocked(evaluator):
+    prefix_list_rule = {"IpProtocol": "tcp", "FromPort": 443, "ToPort": 443, "PrefixListIds": [{"PrefixListId": "pl-1"}]}
+    evaluator.security_groups["sg-prefix"] = {"GroupId": "sg-prefix", "IpPermissionsEgress": ALLOW_ALL,
+                                              "IpPermissions": [prefix_list_rule]}
+    web = make_eni(1, "10.0.1.10", group_ids=("sg-web",))
+    assert not evaluate(evaluator, web, make_eni(2, "10.0.1.20", group_ids=("sg-prefix",))).blocked
+    assert not evaluate(evaluator, web, make_eni(3, "10.0.1.30", group_ids=("sg-missing",))).blocked
+
+
+def test_blocked_verdict_becomes_a_predicted_result(evaluator):
+    verdict = evaluate(evaluator, make_eni(1, "10.0.1.10", group_ids=("sg-web",)), destination_ip="8.8.8.8")
+    result = verdict.to_result(region_name="us-east-1")
+    assert result.predicted and result.is_succeed and result.is_reachable is False
+    assert result.explanation_codes == ["NO_ROUTE_TO_DESTINATION"]
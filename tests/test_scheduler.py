@@ -0,0 +1,70 @@
+import time
+import threading
+from types import SimpleNamespace
+
+from routefinder.scheduler import (ApiScheduler, TokenBucket, BACKGROUND, BATCH, INTERACTIVE, MIN_RATE_FRACTION,
+                                   scheduling_priority)
+
+from fakes import FakeEc2Client
+
+
+def test_waiters_are_served_by_priority_then_arrival():
+    bucket = TokenBucket(rate=10, burst=1)
+    bucket.acquire()
+    order = []
+
+    def _acquire(name, priority):
+        bucket.acquire(priority)
+        order.append(name)
+
+    waiters = []
+    for name, priority in (("background", BACKGROUND), ("batch-1", BATCH), ("batch-2", BATCH),
+                           ("interactive", INTERACTIVE)):
+        waiters.append(threading.Thread(target=_acquire, args=(name, priority)))
+        waiters[-1].start()
+        time.sleep(0.01)
+    for waiter in waiters:
+        waiter.join(5)
+    assert order == ["interactive", "batch-1", "batch-2", "background"]
+
+
+def test_throttling_halves_the_rate_and_successes_recover_it():
+    bucket = TokenBucket(rate=10, burst=5)
+    bucket.throttled()
+    assert bucket.rate == 5
+    assert bucket.tokens <= 0
+    bucket.succeeded()
+    assert bucket.rate == 5.5
+    for _ in range(100):
+        bucket.throttled()
+    assert bucket.rate == 10 * MIN_RATE_FRACTION
+    for _ in range(100):
+        bucket.succeeded()
+    assert bucket.rate == 10
+
+
+def test_throttle_error_backs_off_only_that_api():
+    scheduler = ApiScheduler()
+    describe = scheduler.bucket("describe_instances", "us-east-1")
+    start = scheduler.bucket("start_network_insights_analysis", "us-east-1")
+    scheduler._needs_retry("us-east-1", response=(None, {"Error": {"Code": "RequestLimitExceeded"}}),
+                           operation=SimpleNamespace(name="DescribeInstances"))
+    scheduler._needs_retry("us-east-1", response=(None, {"Error": {"Code": "InvalidParameterValue"}}),
+                           operation=SimpleNamespace(name="StartNetworkInsightsAnalysis"))
+    assert describe.rate == describe.max_rate / 2
+    assert start.rate == start.max_rate
+
+
+def test_scheduled_client_uses_the_callers_priority():
+    scheduler = ApiScheduler()
+    client = scheduler.wrap(FakeEc2Client())
+    priorities = []
+    bucket = scheduler.bucket("describe_network_insights_paths", "us-east-1")
+    acquire = bucket.acquire
+    bucket.acquire = lambda priority=INTERACTIVE: priorities.append(priority) or acquire(priority)
+
+    client.describe_network_insights_paths()
+    with scheduling_priority(BATCH):
+        client.describe_network_insights_paths()
+    assert priorities == [INTERACTIVE, BATCH]
+    assert scheduler.wrap(client) is client
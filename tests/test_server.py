@@ -0,0 +1,63 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+from types import SimpleNamespace
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+from routefinder.interfaces.server import RouteFinderService, RouteFinderRequestHandler
+
+
+class FakeCommand:
+    def __init__(self, reload_error=None):
+        self.route_finder = SimpleNamespace(endpoint_map={"EC2": {"i-1": object()}})
+        self.reload_error = reload_error
+        self.reloads = 0
+
+    def reload(self):
+        self.reloads += 1
+        if self.reload_error is not None:
+            raise self.reload_error
+
+
+@pytest.fixture
+def serve():
+    servers = []
+
+    def _serve(command):
+        httpd = ThreadingHTTPServer(("127.0.0.1", 0), RouteFinderRequestHandler)
+        httpd.service = RouteFinderService(command=command, refresh_interval=0).start()
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+        servers.append(httpd)
+        return f"http://127.0.0.1:{httpd.server_port}"
+
+    yield _serve
+    for httpd in servers:
+        httpd.shutdown()
+        httpd.server_close()
+
+
+def post(url):
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, data=b"", method="POST")) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def test_refresh_reloads_the_inventory(serve):
+    command = FakeCommand()
+    status, payload = post(f"{serve(command)}/refresh")
+    assert (status, payload["endpoints"]) == (200, {"EC2": 1})
+    assert command.reloads == 1
+
+
+def test_failed_refresh_returns_an_error_and_keeps_serving(serve):
+    url = serve(FakeCommand(reload_error=RuntimeError("UnauthorizedOperation")))
+    status, payload = post(f"{url}/refresh")
+    assert status == 502
+    assert "UnauthorizedOperation" in payload["error"]
+    with urllib.request.urlopen(f"{url}/healthz") as response:
+        assert json.loads(response.read())["status"] == "ok"
@@ -0,0 +1,65 @@
+import itertools
+
+from routefinder.dto import RouteFindingResult
+from routefinder.sweep import PortSweep, UNDETERMINED, merge_ranges, subtract_ranges
+
+
+class FakeRouteFinder:
+    # Reachable when any open port falls in the analyzed range; with_headers adds the open ports
+    # to the found path's header, as Reachability Analyzer does
+    def __init__(self, open_ranges, with_headers=True):
+        self.open_ranges = open_ranges
+        self.with_headers = with_headers
+        self.ranges = []
+        self._ids = itertools.count()
+
+    def run(self, source, destination=None, destination_ip=None, protocol="tcp", destination_port_range=None,
+            show_progress=True):
+        self.ranges.append(destination_port_range)
+        from_port, to_port = destination_port_range
+        admitted = [(max(a, from_port), min(b, to_port)) for a, b in self.open_ranges
+                    if max(a, from_port) <= min(b, to_port)]
+        analysis = {"Status": "succeeded", "NetworkPathFound": bool(admitted), "ForwardPathComponents": []}
+        if admitted and self.with_headers:
+            analysis["ForwardPathComponents"].append(
+                {"OutboundHeader": {"DestinationPortRanges": [{"From": a, "To": b} for a, b in admitted]}})
+        if not admitted:
+            analysis["Explanations"] = [{"ExplanationCode": "ENI_SG_RULES_MISMATCH"}]
+        return RouteFindingResult(network_insight_path_id="nip-1", network_insight_analysis_id=f"nia-{next(self._ids)}",
+                                  detail={"NetworkInsightsAnalyses": [analysis]})
+
+
+def sweep(route_finder, from_port=1, to_port=65535, **kwargs):
+    verdicts = PortSweep(route_finder, **kwargs).sweep(source=None, destination_ip="10.0.0.1",
+                                                       from_port=from_port, to_port=to_port)
+    return [(v.from_port, v.to_port, v.reachable if v.status != UNDETERMINED else UNDETERMINED) for v in verdicts]
+
+
+def test_range_helpers():
+    assert merge_ranges([(5, 9), (1, 3), (4, 4)]) == [(1, 9)]
+    assert subtract_ranges((1, 100), [(10, 20), (50, 60)]) == [(1, 9), (21, 49), (61, 100)]
+
+
+def test_headers_settle_open_ranges_without_bisection():
+    route_finder = FakeRouteFinder([(22, 22), (443, 443)])
+    assert sweep(route_finder) == [(1, 21, False), (22, 22, True), (23, 442, False), (443, 443, True),
+                                   (444, 65535, False)]
+    assert len(route_finder.ranges) == 4
+
+
+def test_bisection_finds_exact_boundaries_without_headers():
+    route_finder = FakeRouteFinder([(1000, 1000)], with_headers=False)
+    assert sweep(route_finder) == [(1, 999, False), (1000, 1000, True), (1001, 65535, False)]
+    assert len(route_finder.ranges) <= 2 * 17
+
+
+def test_open_range_without_headers_stops_splitting():
+    route_finder = FakeRouteFinder([(1, 65535)], with_headers=False)
+    assert sweep(route_finder, max_ambiguous_splits=3) == [(1, 65535, UNDETERMINED)]
+    assert len(route_finder.ranges) == 31
+
+
+def test_blocked_range_takes_one_analysis():
+    route_finder = FakeRouteFinder([])
+    assert sweep(route_finder, from_port=1024, to_port=2048) == [(1024, 2048, False)]
+    assert route_finder.ranges == [(1024, 2048)]